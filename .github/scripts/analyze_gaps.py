@@ -6,14 +6,50 @@
 """
 
 import os
+import sys
 from pathlib import Path
-import re
 from datetime import datetime
 
+# Общие модули vault (индекс заметок и т.п.)
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / ".obsidian" / "scripts"))
+from note_index import NoteIndex
+import note_frontmatter
+from search_index import SearchIndex, context_at
+
 # Пути к репозиториям
 VK_OFFEE_PATH = Path("/Users/alexander/Github/VK-offee")
 CONVECTOR_PATH = Path("/Users/alexander/Github/creativ-convector")
 
+DRAFTS_FOLDER = "2. Черновики/VK-Coffee"
+SESSIONS_FOLDER = "Сессия стратегирования"
+
+_search_corpus = None
+
+def get_search_corpus():
+    """
+    Заметки для поиска и полнотекстовый индекс по ним.
+    Строится один раз за запуск; индекс сохраняется между запусками
+    и перестраивается только для изменённых заметок.
+    """
+    global _search_corpus
+    if _search_corpus is None:
+        with NoteIndex(CONVECTOR_PATH) as index:
+            index.refresh([DRAFTS_FOLDER, SESSIONS_FOLDER])
+
+            # Черновики VK-Coffee
+            corpus = [(note, 'Черновики') for note in index.notes(DRAFTS_FOLDER)]
+
+            # Последние 5 сессий стратегирования
+            sessions = sorted(index.notes(SESSIONS_FOLDER, recursive=False),
+                              key=lambda n: n['path'], reverse=True)[:5]
+            corpus += [(note, 'Сессия стратегирования') for note in sessions]
+
+            search = SearchIndex(index.db_path.parent / "search_index.pickle")
+            search.update([note for note, _ in corpus])
+
+        _search_corpus = (corpus, search)
+    return _search_corpus
+
 def analyze_gaps_in_vk_offee():
     """Анализ пробелов в VK-offee"""
     print("🔍 Анализ пробелов в VK-offee...\n")
@@ -55,13 +91,11 @@ def analyze_gaps_in_vk_offee():
                     file_content = f.read()
 
                 # Ищем frontmatter со статусом
-                frontmatter_match = re.match(r'^---\n(.*?)\n---', file_content, re.DOTALL)
-                if frontmatter_match:
-                    frontmatter = frontmatter_match.group(1)
-                    status_match = re.search(r'status:\s*["\']?(yellow|red)["\']?', frontmatter)
+                frontmatter = note_frontmatter.parse(file_content)
+                if frontmatter.has_header:
+                    status = frontmatter.get('status', '')
 
-                    if status_match:
-                        status = status_match.group(1)
+                    if status in ('yellow', 'red'):
                         priority = 'high' if status == 'red' else 'medium'
 
                         # Проверяем, не добавили ли уже
@@ -82,67 +116,23 @@ def search_in_convector(keywords):
     """Поиск информации в creativ-convector"""
     results = []
 
-    # Поиск в черновиках VK-Coffee
-    drafts_dir = CONVECTOR_PATH / "2. Черновики" / "VK-Coffee"
-    if drafts_dir.exists():
-        for file_path in drafts_dir.rglob("*.md"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                for keyword in keywords:
-                    if keyword.lower() in content.lower():
-                        results.append({
-                            'file': str(file_path.relative_to(CONVECTOR_PATH)),
-                            'keyword': keyword,
-                            'context': extract_context(content, keyword),
-                            'source': 'Черновики'
-                        })
-                        break  # Один результат на файл
-            except Exception:
-                pass
-
-    # Поиск в сессиях стратегирования
-    sessions_dir = CONVECTOR_PATH / "Сессия стратегирования"
-    if sessions_dir.exists():
-        for file_path in sorted(sessions_dir.glob("*.md"), reverse=True)[:5]:  # Последние 5 сессий
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                for keyword in keywords:
-                    if keyword.lower() in content.lower():
-                        results.append({
-                            'file': str(file_path.relative_to(CONVECTOR_PATH)),
-                            'keyword': keyword,
-                            'context': extract_context(content, keyword),
-                            'source': 'Сессия стратегирования'
-                        })
-                        break  # Один результат на файл
-            except Exception:
-                pass
+    corpus, search = get_search_corpus()
+    hits = {keyword: search.find(keyword) for keyword in keywords}
+
+    for note, source in corpus:
+        for keyword in keywords:
+            position = hits[keyword].get(note['path'])
+            if position:
+                results.append({
+                    'file': note['path'],
+                    'keyword': keyword,
+                    'context': context_at(note['content'], *position),
+                    'source': source
+                })
+                break  # Один результат на файл
 
     return results
 
-def extract_context(content, keyword, context_size=200):
-    """Извлечь контекст вокруг ключевого слова"""
-    content_lower = content.lower()
-    keyword_lower = keyword.lower()
-
-    index = content_lower.find(keyword_lower)
-    if index == -1:
-        return ""
-
-    start = max(0, index - context_size)
-    end = min(len(content), index + len(keyword) + context_size)
-
-    context = content[start:end]
-
-    # Очищаем от лишних символов
-    context = context.replace('\n', ' ').strip()
-
-    return context[:300]  # Максимум 300 символов
-
 def generate_keywords(document_name):
     """Генерация ключевых слов из названия документа"""
     # Убираем расширение и разделяем по дефисам/пробелам
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Журнал перемещений заметок (write-ahead) для сессии стратегирования
+Перемещение пачки заметок либо завершается целиком, либо доводится
+до конца / откатывается при следующем запуске после сбоя.
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def tmp_path_for(path):
+    """Временный файл рядом с целевым (скрытый, в той же папке)"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.journal-tmp")
+
+
+def sync_all():
+    """Один сброс буферов на диск на всю пачку вместо fsync каждого файла"""
+    if hasattr(os, 'sync'):
+        os.sync()
+
+
+class MoveJournal:
+    """
+    Транзакционное перемещение заметок.
+
+    Запись: {'src': исходник, 'dest': черновик, 'content': текст,
+             'archive': копия в архиве Obsidian (необязательно),
+             'archive_src': файл, удаляемый после архивации (необязательно)}.
+
+    Порядок: журнал 'pending' -> временные файлы -> sync -> журнал 'committed'
+    -> атомарные rename и удаление исходников -> sync -> удаление журнала.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _write(self, status, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_path_for(self.path)
+        data = {
+            'status': status,
+            'entries': [
+                {key: str(value) for key, value in entry.items()
+                 if key != 'content' and value is not None}
+                for entry in entries
+            ]
+        }
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _stage(self, entry):
+        """Записать временные файлы записи; ошибка архива не фатальна"""
+        try:
+            with open(tmp_path_for(entry['dest']), 'w', encoding='utf-8') as f:
+                f.write(entry['content'])
+        except Exception as e:
+            return e, None
+
+        if entry.get('archive'):
+            try:
+                with open(tmp_path_for(entry['archive']), 'w', encoding='utf-8') as f:
+                    f.write(entry['content'])
+            except Exception as e:
+                # Недописанный файл убираем, пока путь к нему ещё известен
+                tmp_path_for(entry['archive']).unlink(missing_ok=True)
+                entry['archive'] = entry['archive_src'] = None
+                return None, e
+        return None, None
+
+    @staticmethod
+    def _apply(entry):
+        """Довести запись до конца; безопасно повторять"""
+        dest = Path(entry['dest'])
+        if tmp_path_for(dest).exists():
+            os.replace(tmp_path_for(dest), dest)
+
+        src = Path(entry['src'])
+        if dest.exists() and src.exists():
+            src.unlink()
+
+        archive = entry.get('archive')
+        if archive:
+            if tmp_path_for(archive).exists():
+                os.replace(tmp_path_for(archive), archive)
+            archive_src = entry.get('archive_src')
+            if archive_src and Path(archive).exists() and Path(archive_src).exists():
+                Path(archive_src).unlink()
+
+    @staticmethod
+    def _discard(entry):
+        """Удалить временные файлы незакоммиченной записи"""
+        for key in ('dest', 'archive'):
+            if entry.get(key):
+                tmp_path_for(entry[key]).unlink(missing_ok=True)
+
+    def commit(self, entries, map_fn=map):
+        """
+        Переместить пачку заметок. map_fn — например pool.map для записи
+        в несколько потоков. Возвращает [(ошибка, ошибка архива)] по записям.
+        """
+        entries = [dict(entry) for entry in entries]
+        self._write('pending', entries)
+
+        results = list(map_fn(self._stage, entries))
+        committed = [entry for entry, (error, _) in zip(entries, results) if not error]
+        for entry, (error, _) in zip(entries, results):
+            if error:
+                self._discard(entry)
+        sync_all()
+
+        self._write('committed', committed)
+
+        def apply(entry):
+            try:
+                self._apply(entry)
+                return None
+            except Exception as e:
+                return e
+
+        apply_errors = dict(zip(map(id, committed), map_fn(apply, committed)))
+        sync_all()
+
+        final = []
+        for entry, (error, archive_error) in zip(entries, results):
+            error = error or apply_errors.get(id(entry))
+            final.append((error, archive_error))
+
+        # При ошибке применения журнал остаётся: следующий запуск довершит перенос
+        if not any(apply_errors.values()):
+            self.path.unlink(missing_ok=True)
+        return final
+
+    def recover(self):
+        """
+        Восстановление после сбоя: 'committed' — довести перемещения,
+        'pending' — удалить временные файлы (исходники не тронуты).
+        Возвращает (статус журнала, число записей) или None, если журнала нет.
+        """
+        if not self.path.exists():
+            return None
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Журнал не дописан — значит, временные файлы ещё не создавались
+            self.path.unlink(missing_ok=True)
+            return None
+
+        entries = data.get('entries', [])
+        if data.get('status') == 'committed':
+            for entry in entries:
+                self._apply(entry)
+        else:
+            for entry in entries:
+                self._discard(entry)
+        sync_all()
+
+        self.path.unlink(missing_ok=True)
+        return data.get('status'), len(entries)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Классификатор заметок по проектам на автомате Ахо-Корасик
+Все ключевые слова всех проектов ищутся за один проход по тексту.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / ".obsidian" / "scripts"))
+from aho_corasick import Automaton
+
+
+class ProjectClassifier:
+    """
+    Определяет проект заметки по ключевым словам.
+
+    Ключевое слово должно начинаться с начала слова. Слова короче
+    min_prefix_len символов (например «вк») ищутся только целым словом,
+    остальные — как начало слова («сотрудник» → «сотрудники»).
+    Явно: «кофе*» — начало слова, «=кофе» — только целое слово.
+
+    Счёт проекта — сумма весов различных найденных ключевых слов.
+    """
+
+    def __init__(self, projects, default="Разное", min_prefix_len=4):
+        """
+        projects: {проект: [слово, ...]} или {проект: {слово: вес, ...}}.
+        Порядок проектов задаёт приоритет при равном счёте.
+        """
+        self.default = default
+        self.projects = []
+        self._keywords = []   # (проект, вес, только целым словом) по номеру слова в автомате
+        self._automaton = Automaton()
+
+        for project, keywords in projects.items():
+            if project == default:
+                continue
+            self.projects.append(project)
+            if not isinstance(keywords, dict):
+                keywords = {keyword: 1 for keyword in keywords}
+
+            for keyword, weight in keywords.items():
+                whole_word = len(keyword) < min_prefix_len
+                if keyword.endswith('*'):
+                    keyword, whole_word = keyword[:-1], False
+                elif keyword.startswith('='):
+                    keyword, whole_word = keyword[1:], True
+                if keyword:
+                    self._automaton.add(keyword.lower())
+                    self._keywords.append((project, weight, whole_word))
+
+        self._automaton.build()
+
+    @classmethod
+    def from_config(cls, path, **kwargs):
+        """Загрузить проекты и ключевые слова из JSON-файла"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def matches(self, text):
+        """Номера ключевых слов, найденных в тексте с учётом границ слов"""
+        text = text.lower()
+        found = set()
+
+        for start, end, keyword_id in self._automaton.iter(text):
+            if keyword_id in found:
+                continue
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            whole_word = self._keywords[keyword_id][2]
+            if whole_word and end < len(text) and text[end].isalnum():
+                continue
+            found.add(keyword_id)
+
+        return found
+
+    def scores(self, text):
+        """Счёт каждого проекта с ненулевым числом совпадений"""
+        scores = {}
+        for keyword_id in self.matches(text):
+            project, weight, _ = self._keywords[keyword_id]
+            scores[project] = scores.get(project, 0) + weight
+        return scores
+
+    def classify(self, text):
+        """Проект с максимальным счётом или проект по умолчанию"""
+        scores = self.scores(text)
+        if not scores:
+            return self.default
+        return max(self.projects, key=lambda project: scores.get(project, 0))
@@ -6,21 +6,52 @@
 Этап 2: Создание консолидированного MD файла
 """
 
+import hashlib
+import json
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import re
 
+try:
+    import fcntl
+except ImportError:   # Windows — без межпроцессной блокировки
+    fcntl = None
+
 # Пути
 BASE_DIR = Path(__file__).parent.parent.parent
-INCOMING_DIR = BASE_DIR / "1. Исчезающие заметки"
-DRAFTS_DIR = BASE_DIR / "2. Черновики"
-SESSIONS_DIR = BASE_DIR / "Сессия стратегирования"
+
+# Общие модули vault (индекс заметок и т.п.)
+sys.path.insert(0, str(BASE_DIR / ".obsidian" / "scripts"))
+from note_index import NoteIndex
+import note_frontmatter
+from project_classifier import ProjectClassifier
+from move_journal import MoveJournal
+import vault_walker
+
+# Папки vault по ролям (карта ролей — в vault_walker, переопределяется .obsidian/vault_folders.json)
+INCOMING_DIR = vault_walker.role_dir("inbox", BASE_DIR)
+DRAFTS_DIR = vault_walker.role_dir("drafts", BASE_DIR)
+PROJECTS_DIR = vault_walker.role_dir("projects", BASE_DIR)
+SESSIONS_DIR = vault_walker.role_dir("sessions", BASE_DIR)
+
+# Потоки для чтения/классификации и записи заметок при распределении
+DISTRIBUTE_WORKERS = 8
+
+# Журнал перемещений: незавершённая после сбоя сессия доводится при следующем запуске
+MOVE_JOURNAL = BASE_DIR / ".obsidian" / "cache" / "distribute_journal.json"
+
+# Блокировка распределения: наблюдатель и ручной запуск не разбирают входящие
+# и не восстанавливают журнал одновременно
+DISTRIBUTE_LOCK = BASE_DIR / ".obsidian" / "cache" / "distribute.lock"
 
 # Obsidian .nocloud пути
 NOCLOUD_DIR = Path.home() / "Documents/creativ-convector.nocloud"
-NOCLOUD_INCOMING = NOCLOUD_DIR / "1. Исчезающие заметки"
+NOCLOUD_INCOMING = NOCLOUD_DIR / INCOMING_DIR.name
 NOCLOUD_PROCESSED = NOCLOUD_DIR / "System/Обработано"
 
 # Проекты и их ключевые слова
@@ -35,6 +66,10 @@ PROJECTS = {
     "Разное": []  # Дефолтный проект для неопределенных заметок
 }
 
+# Если есть — проекты и ключевые слова берутся отсюда вместо PROJECTS:
+# {"Проект": ["слово", ...]} или {"Проект": {"слово": вес, ...}}
+PROJECTS_CONFIG = BASE_DIR / ".github" / "projects.json"
+
 # Расшифровка ролей FPF (таблица 3×3)
 ROLE_DESCRIPTIONS = {
     "F1": {
@@ -94,75 +129,57 @@ ROLE_DESCRIPTIONS = {
 }
 
 
+def get_role_code(frontmatter):
+    """Код роли (F1…F9) из разобранного frontmatter"""
+    role_match = re.match(r'\w+', frontmatter.get('role', ''))
+    return role_match.group(0) if role_match else None
+
+
 def update_frontmatter_with_role_description(content):
     """Обновляет frontmatter, добавляя расшифровку роли"""
-    # Ищем frontmatter
-    frontmatter_match = re.match(r'^---\n(.*?)\n---\n', content, re.DOTALL)
-
-    if not frontmatter_match:
+    frontmatter = note_frontmatter.parse(content)
+    if not frontmatter.has_header:
         return content
 
-    frontmatter = frontmatter_match.group(1)
-    rest_content = content[frontmatter_match.end():]
-
-    # Ищем роль в frontmatter
-    role_match = re.search(r'^role:\s*(\w+)', frontmatter, re.MULTILINE)
+    role_code = get_role_code(frontmatter)
 
-    if not role_match:
-        return content
+    # Если роль есть в справочнике и расширенной информации ещё нет — добавляем
+    if role_code in ROLE_DESCRIPTIONS and 'role_full' not in frontmatter.data:
+        role_info = ROLE_DESCRIPTIONS[role_code]
+        return note_frontmatter.update(content, {
+            'role': role_code,
+            'role_full': role_info["name"],
+            'role_description': role_info["description"],
+            'role_system': role_info["system"],
+        }, after='role')
 
-    role_code = role_match.group(1)
+    return content
 
-    # Если роль есть в справочнике, добавляем описание
-    if role_code in ROLE_DESCRIPTIONS:
-        role_info = ROLE_DESCRIPTIONS[role_code]
 
-        # Проверяем, нет ли уже расширенной информации
-        if "role_full" not in frontmatter:
-            # Заменяем простую роль на расширенную
-            new_frontmatter = re.sub(
-                r'^role:\s*\w+',
-                f'role: {role_code}\nrole_full: {role_info["name"]}\nrole_description: {role_info["description"]}\nrole_system: {role_info["system"]}',
-                frontmatter,
-                flags=re.MULTILINE
-            )
+_classifier = None
 
-            return f'---\n{new_frontmatter}\n---\n{rest_content}'
 
-    return content
+def get_classifier():
+    """Классификатор проектов, собирается один раз за запуск"""
+    global _classifier
+    if _classifier is None:
+        if PROJECTS_CONFIG.exists():
+            _classifier = ProjectClassifier.from_config(PROJECTS_CONFIG)
+        else:
+            _classifier = ProjectClassifier(PROJECTS)
+    return _classifier
 
 
 def analyze_note(content):
     """Определяет проект по содержимому заметки"""
-    content_lower = content.lower()
-
-    # Подсчитываем совпадения для каждого проекта
-    matches = {}
-    for project, keywords in PROJECTS.items():
-        if project == "Разное":
-            continue
-        count = sum(1 for keyword in keywords if keyword in content_lower)
-        if count > 0:
-            matches[project] = count
-
-    # Возвращаем проект с максимальным количеством совпадений
-    if matches:
-        return max(matches, key=matches.get)
-    return "Разное"
+    # Все ключевые слова ищутся за один проход, с учётом границ слов;
+    # побеждает проект с максимальным счётом
+    return get_classifier().classify(content)
 
 
 def get_role_from_frontmatter(content):
     """Извлекает роль из frontmatter"""
-    frontmatter_match = re.match(r'^---\n(.*?)\n---\n', content, re.DOTALL)
-    if not frontmatter_match:
-        return None
-
-    frontmatter = frontmatter_match.group(1)
-    role_match = re.search(r'^role:\s*(\w+)', frontmatter, re.MULTILINE)
-
-    if role_match:
-        return role_match.group(1)
-    return None
+    return get_role_code(note_frontmatter.parse(content))
 
 
 # Маппинг ролей на папки FPF
@@ -179,99 +196,175 @@ ROLE_FOLDERS = {
 }
 
 
-def distribute_notes():
-    """Этап 1: Распределение заметок по черновикам с структурой FPF"""
-    print("🚀 ЭТАП 1: Распределение заметок по черновикам\n")
+def prepare_note(note_path):
+    """Читает заметку, дополняет frontmatter, определяет проект и роль"""
+    try:
+        with open(note_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        return {'note_path': note_path, 'error': e}
 
-    processed_notes = []
+    # Обновляем frontmatter с расшифровкой роли
+    content = update_frontmatter_with_role_description(content)
 
-    # Получаем все MD файлы из входящих
-    notes = list(INCOMING_DIR.glob("*.md"))
+    # Извлекаем роль из frontmatter
+    role = get_role_from_frontmatter(content)
 
-    if not notes:
-        print("📭 Нет заметок для обработки")
-        return processed_notes
+    return {
+        'note_path': note_path,
+        'content': content,
+        'project': analyze_note(content),
+        'role': role if role in ROLE_FOLDERS else None,
+        'error': None
+    }
 
-    print(f"📝 Найдено заметок: {len(notes)}\n")
 
-    for note_path in notes:
-        # Пропускаем .gitkeep и служебные файлы
-        if note_path.name.startswith('.'):
-            continue
+@contextmanager
+def distribute_lock():
+    """Эксклюзивная блокировка распределения; отдаёт False, если её держит другой процесс"""
+    if fcntl is None:
+        yield True
+        return
 
-        # Читаем содержимое
+    DISTRIBUTE_LOCK.parent.mkdir(parents=True, exist_ok=True)
+    with open(DISTRIBUTE_LOCK, 'w') as lock_file:
         try:
-            with open(note_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"❌ Ошибка чтения {note_path.name}: {e}")
-            continue
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-        # Обновляем frontmatter с расшифровкой роли
-        content = update_frontmatter_with_role_description(content)
 
-        # Определяем проект
-        project = analyze_note(content)
+def distribute_notes(workers=DISTRIBUTE_WORKERS, notes=None):
+    """
+    Этап 1: Распределение заметок по черновикам с структурой FPF
 
-        # Извлекаем роль из frontmatter
-        role = get_role_from_frontmatter(content)
+    Конвейер: чтение и классификация в пуле потоков -> планирование путей
+    по порядку -> транзакционная запись через журнал (MoveJournal)
+    -> отчёт в исходном порядке заметок.
 
-        # Если роль не определена, используем F4 по умолчанию
-        if not role or role not in ROLE_FOLDERS:
-            role = "F4"
-            print(f"⚠️  {note_path.name} - роль не определена, используем F4")
+    notes — распределить только эти файлы из входящих (например, от
+    наблюдателя за папкой); по умолчанию — все заметки входящих.
+    Если распределение уже идёт в другом процессе, ничего не делает.
+    """
+    print("🚀 ЭТАП 1: Распределение заметок по черновикам\n")
 
-        # Создаем путь с структурой FPF: Проект/F#-Роль/
-        project_dir = DRAFTS_DIR / project
-        role_dir = project_dir / ROLE_FOLDERS[role]
-        role_dir.mkdir(parents=True, exist_ok=True)
+    with distribute_lock() as acquired:
+        if not acquired:
+            print("⏳ Распределение уже идёт в другом процессе — пропускаю")
+            return []
+        return _distribute_notes(workers, notes)
 
-        # Целевой путь для файла
-        dest_path = role_dir / note_path.name
 
-        # Если файл уже существует, добавляем timestamp
-        if dest_path.exists():
-            timestamp = datetime.now().strftime("%H%M%S")
-            name_parts = note_path.stem, timestamp, note_path.suffix
-            dest_path = role_dir / f"{name_parts[0]}_{name_parts[1]}{name_parts[2]}"
+def _distribute_notes(workers, notes):
+    processed_notes = []
+    journal = MoveJournal(MOVE_JOURNAL)
+
+    # Доводим или откатываем перемещения, прерванные прошлым запуском
+    recovered = journal.recover()
+    if recovered:
+        status, count = recovered
+        action = "завершено" if status == 'committed' else "отменено"
+        print(f"♻️  Восстановление после сбоя: {action} перемещений: {count}\n")
+
+    # Получаем все MD файлы из входящих (или только переданные)
+    if notes is None:
+        notes = list(INCOMING_DIR.glob("*.md"))
+    else:
+        notes = [Path(n) for n in notes
+                 if Path(n).parent == INCOMING_DIR and Path(n).suffix == ".md" and Path(n).is_file()]
 
-        try:
-            # Записываем обновленное содержимое
-            with open(dest_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+    if not notes:
+        print("📭 Нет заметок для обработки")
+        return processed_notes
+
+    print(f"📝 Найдено заметок: {len(notes)}\n")
+
+    # Пропускаем .gitkeep и служебные файлы
+    notes = [n for n in notes if not n.name.startswith('.')]
+
+    get_classifier()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Чтение, frontmatter и классификация
+        prepared = list(pool.map(prepare_note, notes))
+
+        # Планируем пути по порядку: коллизии имён решаются детерминированно
+        plans = []
+        dirs = set()
+        for item in prepared:
+            note_path = item['note_path']
+            if item['error']:
+                print(f"❌ Ошибка чтения {note_path.name}: {item['error']}")
+                continue
+
+            # Если роль не определена, используем F4 по умолчанию
+            if not item['role']:
+                item['role'] = "F4"
+                print(f"⚠️  {note_path.name} - роль не определена, используем F4")
+
+            # Создаем путь с структурой FPF: Проект/F#-Роль/
+            role_dir = DRAFTS_DIR / item['project'] / ROLE_FOLDERS[item['role']]
+            if role_dir not in dirs:
+                role_dir.mkdir(parents=True, exist_ok=True)
+                dirs.add(role_dir)
+
+            # Целевой путь для файла
+            dest_path = role_dir / note_path.name
 
-            # Удаляем оригинальный файл из GitHub
-            note_path.unlink()
+            # Если файл уже существует, добавляем timestamp
+            if dest_path.exists():
+                timestamp = datetime.now().strftime("%H%M%S")
+                name_parts = note_path.stem, timestamp, note_path.suffix
+                dest_path = role_dir / f"{name_parts[0]}_{name_parts[1]}{name_parts[2]}"
 
-            # Копируем в Obsidian System/Обработано/YYYY-MM-DD/
-            today = datetime.now().strftime("%Y-%m-%d")
-            nocloud_dest_dir = NOCLOUD_PROCESSED / today
+            item['dest_path'] = dest_path
+            plans.append(item)
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        nocloud_dest_dir = NOCLOUD_PROCESSED / today
+        try:
             nocloud_dest_dir.mkdir(parents=True, exist_ok=True)
-            nocloud_dest = nocloud_dest_dir / note_path.name
-            try:
-                with open(nocloud_dest, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                # Удаляем из Obsidian "1. Исчезающие заметки"
-                nocloud_src = NOCLOUD_INCOMING / note_path.name
-                if nocloud_src.exists():
-                    nocloud_src.unlink()
-            except Exception as e:
-                print(f"⚠️  Obsidian archive error for {note_path.name}: {e}")
-
-            print(f"✅ {note_path.name}")
-            print(f"   → Проект: {project}")
-            print(f"   → Роль: {role} ({ROLE_FOLDERS[role]})")
-            print(f"   → Путь: {dest_path.relative_to(BASE_DIR)}\n")
-
-            # Сохраняем информацию для консолидации
-            processed_notes.append({
-                'filename': note_path.name,
-                'project': project,
-                'content': content,
-                'dest_path': dest_path
-            })
+            archive_ok = True
         except Exception as e:
-            print(f"❌ Ошибка перемещения {note_path.name}: {e}\n")
+            print(f"⚠️  Obsidian archive error: {e}")
+            archive_ok = False
+
+        # Запись пачкой через журнал: черновик, архив в Obsidian, удаление исходников
+        results = journal.commit([
+            {
+                'src': plan['note_path'],
+                'dest': plan['dest_path'],
+                'content': plan['content'],
+                'archive': nocloud_dest_dir / plan['note_path'].name if archive_ok else None,
+                'archive_src': NOCLOUD_INCOMING / plan['note_path'].name if archive_ok else None
+            }
+            for plan in plans
+        ], map_fn=pool.map)
+
+    for plan, (error, archive_error) in zip(plans, results):
+        note_path = plan['note_path']
+        if error:
+            print(f"❌ Ошибка перемещения {note_path.name}: {error}\n")
+            continue
+        if archive_error:
+            print(f"⚠️  Obsidian archive error for {note_path.name}: {archive_error}")
+
+        print(f"✅ {note_path.name}")
+        print(f"   → Проект: {plan['project']}")
+        print(f"   → Роль: {plan['role']} ({ROLE_FOLDERS[plan['role']]})")
+        print(f"   → Путь: {plan['dest_path'].relative_to(BASE_DIR)}\n")
+
+        # Сохраняем информацию для консолидации
+        processed_notes.append({
+            'filename': note_path.name,
+            'project': plan['project'],
+            'content': plan['content'],
+            'dest_path': plan['dest_path']
+        })
 
     return processed_notes
 
@@ -285,9 +378,14 @@ def create_consolidated_file(processed_notes):
         print("📭 Нет заметок для консолидации")
         return
 
-    # Создаем имя файла с датой
+    # Создаем имя файла с датой; несколько сессий за минуту (наблюдатель) —
+    # с номером, чтобы не перезаписать файл, ещё не забранный экстрактором
     session_date = datetime.now().strftime("%Y-%m-%d_%H-%M")
     session_file = SESSIONS_DIR / f"Сессия стратегирования {session_date}.md"
+    copy = 2
+    while session_file.exists():
+        session_file = SESSIONS_DIR / f"Сессия стратегирования {session_date} ({copy}).md"
+        copy += 1
 
     # Формируем содержимое
     content_parts = []
@@ -346,84 +444,76 @@ def create_consolidated_file(processed_notes):
         return None
 
 
+def needs_role_description(frontmatter):
+    """Есть роль из справочника, но ещё нет её расшифровки (frontmatter — dict полей)"""
+    return get_role_code(frontmatter) in ROLE_DESCRIPTIONS and 'role_full' not in frontmatter
+
+
 def update_existing_notes():
-    """Обновляет существующие заметки в черновиках и приоритетных проектах, добавляя расшифровку ролей"""
+    """
+    Обновляет существующие заметки в черновиках и приоритетных проектах, добавляя расшифровку ролей
+
+    Решение принимается по frontmatter из индекса заметок (NoteIndex сам
+    перечитывает только изменённые файлы): открываются и переписываются
+    только заметки, которым расшифровка действительно нужна.
+    """
     print("\n" + "="*60)
     print("🔄 ОБНОВЛЕНИЕ СУЩЕСТВУЮЩИХ ЗАМЕТОК\n")
 
     updated_count = 0
+    skipped_count = 0
+    checked_count = 0
 
-    # Папки для обработки
+    # Папки для обработки и глубина заметок в них:
+    # черновики — Проект/заметка.md, приоритетные — Проект/F#-Роль/заметка.md
     folders_to_process = [
-        (DRAFTS_DIR, "2. Черновики"),
-        (BASE_DIR / "3. Приоритетные проекты", "3. Приоритетные проекты")
+        (DRAFTS_DIR, DRAFTS_DIR.name, 2),
+        (PROJECTS_DIR, PROJECTS_DIR.name, 3)
     ]
 
-    for folder_path, folder_name in folders_to_process:
-        if not folder_path.exists():
-            continue
-
-        print(f"\n📁 Обработка: {folder_name}\n")
-        folder_updated = 0
+    with NoteIndex(BASE_DIR) as index:
+        index.refresh([name for _, name, _ in folders_to_process])
 
-        # Проходим по всем проектам в папке
-        for project_dir in folder_path.iterdir():
-            if not project_dir.is_dir():
+        for folder_path, folder_name, depth in folders_to_process:
+            if not folder_path.exists():
                 continue
 
-            # Для приоритетных проектов нужно пройти по подпапкам F1-F9
-            if folder_name == "3. Приоритетные проекты":
-                # Проходим по папкам F1-F9
-                for role_dir in project_dir.iterdir():
-                    if not role_dir.is_dir():
-                        continue
-
-                    # Проходим по всем MD файлам в папке роли
-                    for note_path in role_dir.glob("*.md"):
-                        try:
-                            # Читаем содержимое
-                            with open(note_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-
-                            # Обновляем frontmatter
-                            updated_content = update_frontmatter_with_role_description(content)
-
-                            # Если содержимое изменилось, записываем обратно
-                            if updated_content != content:
-                                with open(note_path, 'w', encoding='utf-8') as f:
-                                    f.write(updated_content)
-
-                                folder_updated += 1
-                                print(f"✅ {note_path.relative_to(BASE_DIR)}")
-
-                        except Exception as e:
-                            print(f"❌ Ошибка: {note_path.name}: {e}")
-            else:
-                # Для черновиков - просто проходим по MD файлам
-                for note_path in project_dir.glob("*.md"):
-                    try:
-                        # Читаем содержимое
-                        with open(note_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        # Обновляем frontmatter
-                        updated_content = update_frontmatter_with_role_description(content)
-
-                        # Если содержимое изменилось, записываем обратно
-                        if updated_content != content:
-                            with open(note_path, 'w', encoding='utf-8') as f:
-                                f.write(updated_content)
-
-                            folder_updated += 1
-                            print(f"✅ {note_path.relative_to(BASE_DIR)}")
-
-                    except Exception as e:
-                        print(f"❌ Ошибка: {note_path.name}: {e}")
-
-        print(f"\n   Обновлено в {folder_name}: {folder_updated}")
-        updated_count += folder_updated
+            print(f"\n📁 Обработка: {folder_name}\n")
+            folder_updated = 0
+
+            for note in index.notes(folder_name):
+                note_path = BASE_DIR / note['path']
+                if len(note_path.relative_to(folder_path).parts) != depth:
+                    continue
+
+                # Расшифровка уже есть или роли нет — файл не открываем
+                if not needs_role_description(note['frontmatter']):
+                    skipped_count += 1
+                    continue
+
+                checked_count += 1
+                try:
+                    content = note['content']
+
+                    # Обновляем frontmatter
+                    updated_content = update_frontmatter_with_role_description(content)
+
+                    # Если содержимое изменилось, записываем обратно
+                    if updated_content != content:
+                        with open(note_path, 'w', encoding='utf-8') as f:
+                            f.write(updated_content)
+
+                        folder_updated += 1
+                        print(f"✅ {note_path.relative_to(BASE_DIR)}")
+
+                except Exception as e:
+                    print(f"❌ Ошибка: {note_path.name}: {e}")
+
+            print(f"\n   Обновлено в {folder_name}: {folder_updated}")
+            updated_count += folder_updated
 
     print(f"\n📊 Всего обновлено заметок: {updated_count}")
+    print(f"   Проверено: {checked_count}, пропущено (расшифровка не нужна): {skipped_count}")
 
 
 def run_session_import(session_file):
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Синхронизация заметок Obsidian (.nocloud) → репозиторий creativ-convector
+Копируются только файлы, содержимое которых действительно изменилось:
+манифест хранит размер, mtime и sha256 каждого синхронизированного файла.
+Удаления и переименования в источнике повторяются в репозитории.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+NOCLOUD_DIR = Path.home() / "Documents/creativ-convector.nocloud"
+GITHUB_DIR = Path.home() / "Github/creativ-convector"
+
+# Папки для синхронизации
+SYNC_FOLDERS = [
+    "1. Исчезающие заметки",
+    "2. Черновики",
+    "3. Приоритетные проекты",
+]
+
+MANIFEST_VERSION = 1
+HASH_CHUNK = 1024 * 1024
+
+
+def manifest_path(dst_root):
+    return Path(dst_root) / ".obsidian" / "cache" / "sync_manifest.json"
+
+
+def load_manifest(path):
+    """Манифест: относительный путь → {'size', 'mtime_ns', 'hash'} последней синхронизации"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == MANIFEST_VERSION:
+            return data['files']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_manifest(path, files):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def scan(root, folder):
+    """Все .md файлы папки: (относительный путь, stat) — один os.scandir на каталог"""
+    stack = [os.path.join(root, folder)]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.md') and entry.is_file():
+                    yield os.path.relpath(entry.path, root), entry.stat()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_file(src, dst, st):
+    """
+    Атомарно скопировать src в dst: байты через copy_file_range (в ядре,
+    без буфера в Python), где он есть, иначе shutil; затем os.replace.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst.with_name(f".{dst.name}.sync-tmp")
+    try:
+        if hasattr(os, 'copy_file_range'):
+            with open(src, 'rb') as fsrc, open(tmp_path, 'wb') as fdst:
+                remaining = st.st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining:
+                    # Файл укоротился во время копирования — докопируем как есть
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+                    shutil.copyfileobj(fsrc, fdst)
+        else:
+            shutil.copyfile(src, tmp_path)
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_path, dst)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def prune_empty_dirs(path, stop):
+    """Удалить опустевшие каталоги от path вверх до stop (не включая)"""
+    path, stop = Path(path), Path(stop)
+    while path != stop and stop in path.parents:
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+def sync(src_root=NOCLOUD_DIR, dst_root=GITHUB_DIR, folders=SYNC_FOLDERS, paths=None):
+    """
+    Синхронизировать папки folders из src_root в dst_root.
+    paths — проверить только эти относительные пути (например, от наблюдателя
+    за файлами), без обхода папок; остальные записи манифеста не трогаются.
+    Возвращает статистику: copied, renamed, deleted, unchanged, skipped
+    и paths — изменённые в dst_root относительные пути (для git).
+    """
+    src_root, dst_root = Path(src_root), Path(dst_root)
+    manifest_file = manifest_path(dst_root)
+    previous = load_manifest(manifest_file)
+    files = {}
+    stats = {'copied': 0, 'renamed': 0, 'deleted': 0, 'unchanged': 0, 'skipped': 0}
+    touched = []   # пути в dst_root, которые синхронизация создала, изменила или удалила
+    changed = []   # (путь, stat, хэш) — новые или изменённые файлы
+
+    def folder_root(rel_path):
+        """Корень синхронизируемой папки файла: её саму не удаляем, даже пустую"""
+        for folder in folders:
+            if rel_path.startswith(folder + os.sep):
+                return dst_root / folder
+        return dst_root
+
+    def entries():
+        if paths is not None:
+            for rel_path in paths:
+                try:
+                    st = os.stat(src_root / rel_path)
+                except OSError:
+                    continue
+                yield rel_path, st
+            return
+
+        for folder in folders:
+            if not (src_root / folder).is_dir():
+                # Папки нет в источнике — ничего в ней не трогаем
+                files.update({path: info for path, info in previous.items()
+                              if path.startswith(folder + os.sep)})
+                continue
+            yield from scan(src_root, folder)
+
+    if paths is not None:
+        paths = {str(path) for path in paths
+                 if str(path).endswith('.md') and folder_root(str(path)) != dst_root}
+        files = {path: info for path, info in previous.items() if path not in paths}
+
+    for rel_path, st in entries():
+        known = previous.get(rel_path)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            files[rel_path] = known
+            stats['unchanged'] += 1
+            continue
+
+        try:
+            content_hash = file_hash(src_root / rel_path)
+        except OSError:
+            # Файл есть, но не читается — не считаем его удалённым
+            if known:
+                files[rel_path] = known
+            stats['skipped'] += 1
+            continue
+        info = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': content_hash}
+        files[rel_path] = info
+
+        dst = dst_root / rel_path
+        if known and known['hash'] == content_hash and dst.exists():
+            # Файл тронут, но байты те же — только обновляем манифест
+            stats['unchanged'] += 1
+            continue
+        changed.append((rel_path, st, info))
+
+    # Исчезнувшие из источника файлы: переименования узнаём по хэшу
+    removed = {}
+    for rel_path, info in previous.items():
+        if rel_path not in files:
+            removed.setdefault(info['hash'], []).append(rel_path)
+
+    for rel_path, st, info in changed:
+        dst = dst_root / rel_path
+        candidates = removed.get(info['hash'])
+        old_path = candidates[-1] if candidates else None
+        # Переносим только копию, не изменённую в репозитории; изменённую
+        # оставит цикл удаления ниже, а новый файл просто копируется
+        if (old_path and (dst_root / old_path).exists() and not dst.exists()
+                and file_hash(dst_root / old_path) == info['hash']):
+            candidates.pop()
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(dst_root / old_path, dst)
+            os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+            prune_empty_dirs((dst_root / old_path).parent, folder_root(old_path))
+            touched.extend([old_path, rel_path])
+            stats['renamed'] += 1
+            continue
+
+        if dst.exists() and dst.stat().st_size == st.st_size and file_hash(dst) == info['hash']:
+            stats['unchanged'] += 1
+            continue
+        try:
+            copy_file(src_root / rel_path, dst, st)
+            touched.append(rel_path)
+            stats['copied'] += 1
+        except OSError as e:
+            print(f"⚠️  Не удалось скопировать {rel_path}: {e}", file=sys.stderr)
+            del files[rel_path]
+            stats['skipped'] += 1
+
+    # Удаляем только копии, которые не правили в репозитории после синхронизации
+    for content_hash, old_paths in removed.items():
+        for rel_path in old_paths:
+            dst = dst_root / rel_path
+            if not dst.exists():
+                continue
+            if file_hash(dst) != content_hash:
+                print(f"⚠️  {rel_path} удалён в Obsidian, но изменён в репозитории — оставляю",
+                      file=sys.stderr)
+                continue
+            dst.unlink()
+            prune_empty_dirs(dst.parent, folder_root(rel_path))
+            touched.append(rel_path)
+            stats['deleted'] += 1
+
+    save_manifest(manifest_file, files)
+    stats['paths'] = touched
+    return stats
+
+
+def main():
+    """
+    sync_notes.py [источник] [репозиторий] [--paths-out ФАЙЛ]
+    --paths-out — записать изменённые пути (через NUL) для git --pathspec-from-file
+    """
+    args = sys.argv[1:]
+    paths_out = None
+    if '--paths-out' in args:
+        i = args.index('--paths-out')
+        paths_out = args[i + 1]
+        del args[i:i + 2]
+    src_root = Path(args[0]) if len(args) > 0 else NOCLOUD_DIR
+    dst_root = Path(args[1]) if len(args) > 1 else GITHUB_DIR
+
+    started = time.monotonic()
+    stats = sync(src_root, dst_root)
+    elapsed = time.monotonic() - started
+
+    if paths_out:
+        with open(paths_out, 'w', encoding='utf-8') as f:
+            f.write(''.join(path + '\0' for path in stats['paths']))
+
+    print(f"🔄 Синхронизация: скопировано {stats['copied']}, "
+          f"переименовано {stats['renamed']}, удалено {stats['deleted']}, "
+          f"без изменений {stats['unchanged']}"
+          + (f", пропущено {stats['skipped']}" if stats['skipped'] else "")
+          + f" ({elapsed:.2f} с)")
+
+
+if __name__ == "__main__":
+    main()
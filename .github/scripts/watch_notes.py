@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Наблюдатель за входящими заметками
+Следит за «1. Исчезающие заметки» репозитория и папками .nocloud:
+изменения из Obsidian сразу синхронизируются в репозиторий, новые
+входящие заметки сразу распределяются по черновикам и собираются
+в файл сессии для экстрактора. На Linux — inotify, на других
+системах — периодический опрос. Всплески событий склеиваются.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import strategy_session
+import sync_notes
+
+# Пауза без событий, после которой пачка изменений обрабатывается
+DEBOUNCE = 1.5
+# Дольше пачку не копим, даже если события продолжаются
+MAX_BATCH_WAIT = 10.0
+POLL_INTERVAL = 2.0
+
+# Маски inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def walk_dirs(root):
+    """root и все вложенные каталоги (кроме служебных с точкой)"""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        yield dirpath
+
+
+class InotifyWatcher:
+    """
+    Рекурсивное наблюдение через inotify (ctypes, без зависимостей).
+
+    read(timeout) возвращает множество изменённых путей; каталог в ответе
+    означает «пересканировать его целиком» (переименование каталога,
+    переполнение очереди событий).
+    """
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+
+        self.roots = [Path(root) for root in roots]
+        self._dirs = {}   # дескриптор наблюдения → каталог
+        for root in self.roots:
+            for directory in walk_dirs(root):
+                self._add(directory)
+
+    def _add(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = Path(directory)
+
+    def read(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        data = os.read(self._fd, 64 * 1024)
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.update(self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+
+            if mask & IN_ISDIR:
+                # Новый каталог — следим и за ним; его содержимое пересканируем
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for subdirectory in walk_dirs(path):
+                        self._add(subdirectory)
+                changes.add(path if mask & (IN_CREATE | IN_MOVED_TO) else directory)
+            else:
+                changes.add(path)
+        return changes
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Запасной вариант: сравнение снимков (mtime, размер) .md файлов раз в interval"""
+
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self.roots = [Path(root) for root in roots]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root in self.roots:
+            for directory in walk_dirs(root):
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.name.endswith('.md') and entry.is_file():
+                                st = entry.stat()
+                                snapshot[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue
+        return snapshot
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        snapshot = self._scan()
+        changes = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changes
+
+    def close(self):
+        pass
+
+
+def create_watcher(roots, polling=False):
+    roots = [root for root in roots if Path(root).is_dir()]
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify недоступен ({e}), перехожу на опрос")
+    return PollingWatcher(roots)
+
+
+def next_batch(watcher):
+    """Дождаться изменений и копить их, пока не наступит пауза DEBOUNCE"""
+    changes = set()
+    while not changes:
+        changes = watcher.read(None)
+
+    started = time.monotonic()
+    while time.monotonic() - started < MAX_BATCH_WAIT:
+        more = watcher.read(DEBOUNCE)
+        if not more:
+            break
+        changes |= more
+    return changes
+
+
+def is_note(path):
+    return path.suffix == '.md' and not path.name.startswith('.')
+
+
+def handle(changes, src_root, dst_root):
+    """Синхронизировать изменённое из .nocloud и распределить новые входящие"""
+    synced = set()
+    full_sync = False
+    for path in changes:
+        try:
+            rel_path = path.relative_to(src_root)
+        except ValueError:
+            continue
+        if is_note(path):
+            synced.add(str(rel_path))
+        elif path.is_dir():
+            full_sync = True   # каталог: переименование/перенос целиком
+
+    if synced or full_sync:
+        stats = sync_notes.sync(src_root, dst_root, paths=None if full_sync else synced)
+        print(f"🔄 Синхронизация: скопировано {stats['copied']}, "
+              f"переименовано {stats['renamed']}, удалено {stats['deleted']}")
+
+    incoming = strategy_session.INCOMING_DIR
+    if incoming in changes:
+        notes = None
+    else:
+        notes = sorted(path for path in changes
+                       if path.parent == incoming and is_note(path) and path.exists())
+    if notes is None or notes:
+        process_incoming(notes)
+
+
+def process_incoming(notes=None):
+    """
+    Распределить входящие и, как сессия стратегирования, собрать из
+    распределённых файл сессии и отправить его в очередь экстрактора
+    """
+    processed_notes = strategy_session.distribute_notes(notes=notes)
+    if not processed_notes:
+        return
+    session_file = strategy_session.create_consolidated_file(processed_notes)
+    strategy_session.run_session_import(session_file)
+
+
+def main():
+    polling = "--poll" in sys.argv
+    src_root = sync_notes.NOCLOUD_DIR
+    dst_root = strategy_session.BASE_DIR
+
+    roots = [strategy_session.INCOMING_DIR]
+    roots += [src_root / folder for folder in sync_notes.SYNC_FOLDERS]
+    watcher = create_watcher(roots, polling)
+    mode = "опрос" if isinstance(watcher, PollingWatcher) else "inotify"
+    print(f"👀 Слежу за {len(watcher.roots)} папками ({mode}). Ctrl+C — выход")
+
+    # Входящие, накопившиеся до запуска
+    process_incoming()
+
+    try:
+        while True:
+            changes = next_batch(watcher)
+            print(f"\n⚡ Изменений: {len(changes)} [{time.strftime('%H:%M:%S')}]")
+            try:
+                handle(changes, src_root, dst_root)
+            except Exception as e:
+                print(f"❌ Ошибка обработки: {e}")
+    except KeyboardInterrupt:
+        print("\n👋 Наблюдение остановлено")
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Автомат Ахо-Корасик: поиск множества строк в тексте за один проход
+Общая основа для PhraseMatcher (имена заметок в отчёте) и
+ProjectClassifier (ключевые слова проектов).
+"""
+
+from collections import deque
+
+
+class Automaton:
+    """
+    Автомат по набору образцов.
+
+    add() — добавить образец (номер образца — порядок добавления),
+    build() — построить fail-ссылки после всех add(),
+    iter() — все вхождения (начало, конец, номер образца), включая
+    пересекающиеся, в порядке конца вхождения. Регистр не приводится:
+    образцы и текст нормализует вызывающий код.
+    """
+
+    def __init__(self):
+        # Узлы: переходы, fail-ссылка, (длина, номер) образцов, кончающихся здесь
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self.size = 0
+
+    def add(self, pattern):
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+
+        self._output[node].append((len(pattern), self.size))
+        self.size += 1
+        return self.size - 1
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        return self
+
+    def iter(self, text):
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for length, pattern_id in self._output[node]:
+                yield i - length + 1, i + 1, pattern_id
@@ -10,11 +10,12 @@ from datetime import datetime
 
 # Добавляем путь к скриптам
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from ai_provider import get_provider
+from ai_provider import get_provider, write_stream
+from prompt_builder import PromptBuilder
 
 
-def analyze_report(file_path, provider):
-    """Analyze weekly report using AI"""
+def analyze_report(file_path, provider, echo=True):
+    """Analyze weekly report using AI (echo — печатать ответ по мере генерации)"""
 
     # Read the report
     try:
@@ -26,7 +27,8 @@ def analyze_report(file_path, provider):
 
     system_prompt = "Ты эксперт по стратегическому планированию и продуктивности."
 
-    user_prompt = f"""Проанализируй этот недельный отчёт и предоставь:
+    builder = PromptBuilder.for_provider(provider, max_tokens=2000)
+    builder.add("""Проанализируй этот недельный отчёт и предоставь:
 
 1. **Анализ достижений**: Что сделано хорошо?
 2. **Выявление паттернов**: Какие тренды видны?
@@ -36,31 +38,37 @@ def analyze_report(file_path, provider):
 
 Отчёт:
 ---
-{content}
+""")
+    builder.add_document(content)
+    builder.add("""
 ---
 
-Предоставь структурированный анализ на русском языке в формате Markdown."""
+Предоставь структурированный анализ на русском языке в формате Markdown.""")
+    user_prompt = builder.build()
+    print(builder.report())
 
     try:
         print(f"[{provider.name}] Анализирую отчёт...")
 
-        analysis = provider.chat(
+        deltas = provider.chat(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             max_tokens=2000,
-            temperature=0.7
+            temperature=0.7,
+            stream=True
         )
 
-        # Save analysis
+        # Save analysis (пишется по мере генерации)
         output_path = file_path.replace('.md', ' - AI Анализ.md')
         now = datetime.now().strftime('%Y-%m-%d %H:%M')
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(f"# AI Анализ отчёта\n\n")
-            f.write(f"**Дата анализа:** {now}\n")
-            f.write(f"**Провайдер:** {provider.name} ({provider.model})\n\n")
-            f.write("---\n\n")
-            f.write(analysis)
+        header = (
+            f"# AI Анализ отчёта\n\n"
+            f"**Дата анализа:** {now}\n"
+            f"**Провайдер:** {provider.name} ({provider.model})\n\n"
+            "---\n\n"
+        )
+        write_stream(output_path, deltas, prefix=header, echo=echo)
 
         print(f"[{provider.name}] Анализ сохранён: {output_path}")
         return output_path
@@ -90,4 +98,5 @@ if __name__ == "__main__":
         print(f"Ошибка: {e}")
         sys.exit(1)
 
-    analyze_report(file_path, provider)
+    with provider:
+        analyze_report(file_path, provider)
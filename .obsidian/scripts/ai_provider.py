@@ -4,12 +4,24 @@
 Единый интерфейс для всех AI-скриптов в Obsidian
 """
 
+import asyncio
+import hashlib
+import json
+import math
 import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Путь к vault
 VAULT_PATH = Path(__file__).parent.parent.parent
 
+# Служебная папка для кэшей и индексов (не синхронизируется в git)
+CACHE_DIR = VAULT_PATH / ".obsidian" / "cache"
+
 
 def load_env():
     """Загрузить переменные из .env файла"""
@@ -23,15 +35,45 @@ def load_env():
                     os.environ.setdefault(key.strip(), value.strip())
 
 
-def get_provider(provider_name=None):
+def get_provider(provider_name=None, use_cache=True):
     """
     Получить AI провайдера.
 
-    provider_name: 'claude' или 'openai'.
+    provider_name: 'claude', 'openai' или 'mock'.
     Если не указан — пробует claude, потом openai.
+    use_cache: подключить дисковый кэш ответов (см. ResponseCache).
+    Кэш также отключается переменной AI_CACHE=0 в .env.
+
+    Переменная AI_PROVIDER переопределяет provider_name во всех скриптах:
+      mock   — офлайн MockProvider (настройки AI_MOCK_*)
+      record — настоящий провайдер, ответы пишутся в AI_FIXTURES (без кэша)
+      replay — ответы только из AI_FIXTURES, без сети
     """
     load_env()
 
+    mode = os.environ.get("AI_PROVIDER") or provider_name
+    if mode == "mock":
+        provider = MockProvider.from_env()
+    elif mode == "replay":
+        provider = ReplayProvider(_fixtures_path())
+    elif mode == "record":
+        provider = ReplayProvider(_fixtures_path(), inner=_create_provider(provider_name))
+    else:
+        provider = _create_provider(mode)
+
+    # При записи кэш не нужен: ответ из кэша не попал бы в фикстуры
+    if (use_cache and mode != "record"
+            and os.environ.get("AI_CACHE", "1") not in ("0", "off", "false")):
+        provider.cache = ResponseCache.from_env()
+    return provider
+
+
+def _fixtures_path():
+    return os.environ.get("AI_FIXTURES") or CACHE_DIR / "ai_fixtures.jsonl"
+
+
+def _create_provider(provider_name):
+    """Создать провайдера по имени и ключам из окружения"""
     if provider_name == "claude" or provider_name is None:
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if api_key:
@@ -55,16 +97,431 @@ def get_provider(provider_name=None):
     )
 
 
-class ClaudeProvider:
-    """Провайдер Claude (Anthropic)"""
+def write_stream(path, deltas, prefix="", suffix="", echo=True):
+    """
+    Записать потоковый ответ в файл path.
+
+    Фрагменты дописываются во временный файл рядом с path по мере
+    поступления (и печатаются, если echo), в конце файл атомарно
+    переименовывается в path. Возвращает полный текст ответа.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    parts = []
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prefix)
+            for delta in deltas:
+                parts.append(delta)
+                f.write(delta)
+                f.flush()
+                if echo:
+                    print(delta, end='', flush=True)
+            f.write(suffix)
+        if echo:
+            print()
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return ''.join(parts)
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов AI (SQLite), адресуемый по содержимому запроса.
+
+    Ключ — sha256 от (провайдер, модель, system, user, max_tokens, temperature).
+    Размер ограничен max_entries: лишние записи вытесняются по LRU.
+    ttl (секунды) — срок жизни записи, None — бессрочно.
+    """
+
+    DEFAULT_PATH = CACHE_DIR / "ai_responses.sqlite"
+
+    def __init__(self, path=None, max_entries=5000, ttl=None):
+        self.path = Path(path or self.DEFAULT_PATH)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Кэш с настройками из AI_CACHE_PATH, AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL"""
+        ttl = os.environ.get("AI_CACHE_TTL")
+        return cls(
+            path=os.environ.get("AI_CACHE_PATH") or None,
+            max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", 5000)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    @staticmethod
+    def make_key(provider_name, model, system_prompt, user_prompt, max_tokens, temperature):
+        """Хэш параметров запроса"""
+        payload = json.dumps(
+            [provider_name, model, system_prompt, user_prompt, max_tokens, temperature],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Вернуть ответ из кэша или None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        """Сохранить ответ и вытеснить самые старые записи сверх лимита"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """
+    Токен-бакет на запросы/мин и токены/мин, общий для всех экземпляров
+    одного провайдера (и всех потоков процесса).
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_provider(cls, name, rpm, tpm):
+        """Общий лимитер провайдера; AI_RATE_RPM / AI_RATE_TPM переопределяют лимиты"""
+        with cls._registry_lock:
+            if name not in cls._registry:
+                cls._registry[name] = cls(
+                    int(os.environ.get("AI_RATE_RPM", rpm)),
+                    int(os.environ.get("AI_RATE_TPM", tpm)),
+                )
+            return cls._registry[name]
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens, deadline=None):
+        """
+        Дождаться бюджета на один запрос из tokens токенов.
+
+        deadline — момент time.monotonic(), после которого ждать нельзя:
+        тогда поднимается TimeoutError.
+        """
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+
+            if deadline is not None and now + wait > deadline:
+                raise TimeoutError("Превышен срок ожидания лимита запросов к AI")
+            time.sleep(wait)
+
+
+def estimate_tokens(text):
+    """
+    Грубая оценка числа токенов: ≈4 символа на токен для латиницы и
+    ≈2.5 для кириллицы и прочего не-ASCII (русский текст дробится мельче)
+    """
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return int(ascii_chars / 4 + (len(text) - ascii_chars) / 2.5) + 1
+
+
+def _is_retryable(error):
+    """429, 5xx, таймауты и обрывы соединения стоит повторить"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status == 429 or status == 408 or status >= 500
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError') or \
+        isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_after(error):
+    """Значение заголовка Retry-After в секундах, если провайдер его прислал"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class BaseProvider:
+    """
+    Общая часть провайдеров: один лениво созданный SDK-клиент на экземпляр.
 
-    def __init__(self, api_key):
+    Клиент держит пул keep-alive соединений и переиспользуется между
+    вызовами chat() и потоками. Закрывается через close() или with.
+    Если задан cache (ResponseCache), chat() сначала ищет ответ в нём.
+    Запросы к API проходят через общий RateLimiter и повторяются
+    с экспоненциальной задержкой при 429/5xx.
+    """
+
+    name = None
+    model = None
+    # Лимиты по умолчанию: (запросов в минуту, токенов в минуту)
+    rate_limits = (50, 40000)
+    # Окно контекста модели (токены) — верхняя граница промпта с ответом
+    context_tokens = 128000
+    max_retries = 5
+    backoff_base = 1.0
+    backoff_max = 60.0
+
+    def __init__(self, api_key, cache=None):
         self.api_key = api_key
-        self.name = "Claude"
-        self.model = "claude-sonnet-4-20250514"
+        self.cache = cache
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.limiter = RateLimiter.for_provider(self.name, *self.rate_limits)
 
-    def chat(self, system_prompt, user_prompt, max_tokens=2000, temperature=0.7):
-        """Отправить запрос к Claude API"""
+    def _create_client(self):
+        """Создать SDK-клиент (переопределяется в наследниках)"""
+        raise NotImplementedError
+
+    @property
+    def client(self):
+        """SDK-клиент, создаётся при первом обращении"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def chat(self, system_prompt, user_prompt, max_tokens=2000, temperature=0.7,
+             bypass_cache=False, timeout=None, stream=False):
+        """
+        Отправить запрос к модели.
+
+        bypass_cache: не читать ответ из кэша (свежий ответ всё равно сохраняется).
+        timeout: общий срок вызова в секундах, включая ожидание лимита и повторы.
+        stream: вернуть генератор фрагментов текста по мере их поступления.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(
+                self.name, self.model, system_prompt, user_prompt, max_tokens, temperature
+            )
+            cached = None if bypass_cache else self.cache.get(key)
+            if cached is not None:
+                return iter([cached]) if stream else cached
+
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + max_tokens
+
+        if stream:
+            return self._stream_request(
+                system_prompt, user_prompt, max_tokens, temperature, tokens, timeout, key
+            )
+
+        response = self._request(
+            lambda remaining: self._chat(
+                system_prompt, user_prompt, max_tokens, temperature, timeout=remaining
+            ),
+            tokens, timeout
+        )
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    def _stream_request(self, system_prompt, user_prompt, max_tokens, temperature,
+                        tokens, timeout, key):
+        """Потоковый запрос: повторы возможны, пока не пришёл первый фрагмент"""
+        def open_stream(remaining):
+            deltas = self._stream(
+                system_prompt, user_prompt, max_tokens, temperature, timeout=remaining
+            )
+            return next(deltas, None), deltas
+
+        first, deltas = self._request(open_stream, tokens, timeout)
+        if first is None:
+            return
+
+        parts = [first]
+        yield first
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+
+        if key is not None:
+            self.cache.put(key, ''.join(parts))
+
+    def _request(self, call, tokens, timeout):
+        """
+        Вызвать call(remaining_timeout) через лимитер, с повторами
+        и общим сроком timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens, deadline)
+            remaining = deadline - time.monotonic() if deadline else None
+            try:
+                return call(remaining)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise
+
+                attempt += 1
+                print(f"[{self.name}] {type(e).__name__}, повтор {attempt}/{self.max_retries} через {delay:.1f} с")
+                time.sleep(delay)
+
+    def _chat(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Один запрос к API (переопределяется в наследниках)"""
+        raise NotImplementedError
+
+    def _stream(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Потоковый запрос к API: генератор фрагментов текста"""
+        raise NotImplementedError
+
+    async def achat(self, system_prompt, user_prompt, max_tokens=2000, temperature=0.7,
+                    bypass_cache=False, timeout=None):
+        """Асинхронный chat(): запрос выполняется в потоке на общем клиенте"""
+        return await asyncio.to_thread(
+            self.chat, system_prompt, user_prompt, max_tokens, temperature, bypass_cache, timeout
+        )
+
+    async def abatch_chat(self, requests, concurrency=4):
+        """
+        Асинхронно выполнить пачку запросов, не более concurrency одновременно.
+
+        requests: список dict с аргументами chat() (system_prompt, user_prompt, ...).
+        Возвращает список в порядке requests, элементы — dict:
+        {'response': str | None, 'error': Exception | None}.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def run_one(request):
+                async with semaphore:
+                    try:
+                        response = await loop.run_in_executor(
+                            executor, lambda: self.chat(**request)
+                        )
+                        return {'response': response, 'error': None}
+                    except Exception as e:
+                        return {'response': None, 'error': e}
+
+            return await asyncio.gather(*(run_one(r) for r in requests))
+
+    def batch_chat(self, requests, concurrency=4):
+        """Синхронная обёртка над abatch_chat() для обычных скриптов"""
+        return asyncio.run(self.abatch_chat(requests, concurrency))
+
+    def close(self):
+        """Закрыть клиент, его пул соединений и кэш"""
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ClaudeProvider(BaseProvider):
+    """Провайдер Claude (Anthropic)"""
+
+    name = "Claude"
+    model = "claude-sonnet-4-20250514"
+    rate_limits = (50, 40000)
+    context_tokens = 200000
+
+    def _create_client(self):
         try:
             import anthropic
         except ImportError:
@@ -73,31 +530,47 @@ class ClaudeProvider:
                 "Установите: pip3 install anthropic"
             )
 
-        client = anthropic.Anthropic(api_key=self.api_key)
+        # Повторы делает BaseProvider._request
+        return anthropic.Anthropic(api_key=self.api_key, max_retries=0)
 
-        response = client.messages.create(
+    def _chat(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Отправить запрос к Claude API"""
+        response = self.client.messages.create(
             model=self.model,
             max_tokens=max_tokens,
             system=system_prompt,
             messages=[
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=temperature
+            temperature=temperature,
+            **({"timeout": timeout} if timeout else {})
         )
 
         return response.content[0].text
 
+    def _stream(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Потоковый запрос к Claude API"""
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=max_tokens,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            **({"timeout": timeout} if timeout else {})
+        ) as response:
+            yield from response.text_stream
+
 
-class OpenAIProvider:
+class OpenAIProvider(BaseProvider):
     """Провайдер ChatGPT (OpenAI)"""
 
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.name = "ChatGPT"
-        self.model = "gpt-4o-mini"
+    name = "ChatGPT"
+    model = "gpt-4o-mini"
+    rate_limits = (500, 200000)
 
-    def chat(self, system_prompt, user_prompt, max_tokens=2000, temperature=0.7):
-        """Отправить запрос к OpenAI API"""
+    def _create_client(self):
         try:
             from openai import OpenAI
         except ImportError:
@@ -106,16 +579,196 @@ class OpenAIProvider:
                 "Установите: pip3 install openai"
             )
 
-        client = OpenAI(api_key=self.api_key)
+        # Повторы делает BaseProvider._request
+        return OpenAI(api_key=self.api_key, max_retries=0)
 
-        response = client.chat.completions.create(
+    def _chat(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Отправить запрос к OpenAI API"""
+        response = self.client.chat.completions.create(
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            **({"timeout": timeout} if timeout else {})
         )
 
         return response.choices[0].message.content.strip()
+
+    def _stream(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        """Потоковый запрос к OpenAI API"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **({"timeout": timeout} if timeout else {})
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class MockAPIError(Exception):
+    """Имитация ошибки API (429/500) для MockProvider"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Mock API error {status_code}")
+        self.status_code = status_code
+
+
+class MockProvider(BaseProvider):
+    """
+    Офлайн-провайдер для бенчмарков и нагрузочных прогонов без сети.
+
+    Задержка до первого токена — логнормальная со средним latency
+    и разбросом jitter, далее текст выдаётся со скоростью tokens_per_sec.
+    С вероятностью failure_rate запрос падает с 429 или 500.
+    Ответ детерминирован: зависит только от запроса.
+    """
+
+    name = "Mock"
+    model = "mock"
+    rate_limits = (100000, 10 ** 9)
+
+    def __init__(self, latency=0.5, jitter=0.3, tokens_per_sec=50.0,
+                 response_tokens=200, failure_rate=0.0, seed=None):
+        super().__init__(api_key=None)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Настройки из AI_MOCK_LATENCY, AI_MOCK_JITTER, AI_MOCK_TPS,
+        AI_MOCK_RESPONSE_TOKENS, AI_MOCK_FAILURE_RATE, AI_MOCK_SEED"""
+        seed = os.environ.get("AI_MOCK_SEED")
+        return cls(
+            latency=float(os.environ.get("AI_MOCK_LATENCY", 0.5)),
+            jitter=float(os.environ.get("AI_MOCK_JITTER", 0.3)),
+            tokens_per_sec=float(os.environ.get("AI_MOCK_TPS", 50)),
+            response_tokens=int(os.environ.get("AI_MOCK_RESPONSE_TOKENS", 200)),
+            failure_rate=float(os.environ.get("AI_MOCK_FAILURE_RATE", 0)),
+            seed=int(seed) if seed else None,
+        )
+
+    def _create_client(self):
+        return None
+
+    def _draw(self):
+        """Задержка до первого токена и признак сбоя"""
+        with self._random_lock:
+            if self.latency > 0 and self.jitter > 0:
+                # lognormvariate с заданным средним self.latency
+                delay = self._random.lognormvariate(0, self.jitter)
+                delay *= self.latency / math.exp(self.jitter ** 2 / 2)
+            else:
+                delay = self.latency
+            failed = self._random.random() < self.failure_rate
+            status = self._random.choice((429, 500))
+        return delay, failed, status
+
+    def _words(self, system_prompt, user_prompt, max_tokens):
+        digest = hashlib.sha256((system_prompt + user_prompt).encode('utf-8')).hexdigest()
+        count = max(1, min(max_tokens, self.response_tokens))
+        words = [f"Mock-ответ {digest[:8]}:"]
+        words += [f"слово{i}" for i in range(1, count)]
+        return words
+
+    def _chat(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        return ''.join(self._stream(system_prompt, user_prompt, max_tokens, temperature, timeout))
+
+    def _stream(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        delay, failed, status = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise MockAPIError(status)
+
+        pause = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        for i, word in enumerate(self._words(system_prompt, user_prompt, max_tokens)):
+            if pause:
+                time.sleep(pause)
+            yield word if i == 0 else ' ' + word
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Запись и воспроизведение ответов через файл фикстур (JSONL).
+
+    С inner — режим записи: запросы идут в настоящий провайдер inner,
+    каждый ответ дописывается в фикстуры. Без inner — режим воспроизведения:
+    ответы берутся только из фикстур, отсутствующий запрос — KeyError.
+    Ключ записи не зависит от провайдера, поэтому фикстуры, записанные
+    с Claude, воспроизводятся и в скриптах, запрашивающих openai.
+    """
+
+    rate_limits = (100000, 10 ** 9)
+
+    def __init__(self, path, inner=None):
+        self.inner = inner
+        self.name = inner.name if inner else "Replay"
+        self.model = inner.model if inner else "replay"
+        if inner:
+            self.rate_limits = inner.rate_limits
+        super().__init__(api_key=None)
+
+        self.path = Path(path)
+        self._fixtures = {}
+        self._write_lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._fixtures[record['key']] = record['response']
+
+    @staticmethod
+    def _key(system_prompt, user_prompt, max_tokens, temperature):
+        return ResponseCache.make_key(None, None, system_prompt, user_prompt, max_tokens, temperature)
+
+    def _create_client(self):
+        return None
+
+    def _chat(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        key = self._key(system_prompt, user_prompt, max_tokens, temperature)
+        if self.inner is None:
+            if key not in self._fixtures:
+                raise KeyError(f"Нет записанного ответа для запроса {key[:12]} в {self.path}")
+            return self._fixtures[key]
+
+        response = self.inner._chat(system_prompt, user_prompt, max_tokens, temperature, timeout)
+        self._record(key, response)
+        return response
+
+    def _stream(self, system_prompt, user_prompt, max_tokens, temperature, timeout=None):
+        if self.inner is None:
+            yield self._chat(system_prompt, user_prompt, max_tokens, temperature, timeout)
+            return
+
+        parts = []
+        for delta in self.inner._stream(system_prompt, user_prompt, max_tokens, temperature, timeout):
+            parts.append(delta)
+            yield delta
+        self._record(self._key(system_prompt, user_prompt, max_tokens, temperature), ''.join(parts))
+
+    def _record(self, key, response):
+        with self._write_lock:
+            self._fixtures[key] = response
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+
+    def close(self):
+        super().close()
+        if self.inner is not None:
+            self.inner.close()
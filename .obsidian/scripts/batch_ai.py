@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Пакетный запуск AI помощника и анализа отчётов
+Один процесс и один провайдер на все заметки: папки, glob-шаблоны
+и списки файлов (@list.txt). Заметки, не изменившиеся с прошлой
+обработки, пропускаются; остальные обрабатываются параллельно.
+
+Использование:
+    python3 batch_ai.py enhance <папка|шаблон|@список>... [--provider claude|openai]
+    python3 batch_ai.py analyze <папка|шаблон|@список>... [--workers 4] [--force]
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ai_agent import analyze_report
+from ai_provider import CACHE_DIR, get_provider
+from enhance_note import SKIPPED, enhance_note_inline
+import vault_walker
+
+MANIFEST = CACHE_DIR / "batch_ai_manifest.json"
+DEFAULT_WORKERS = 4
+
+USAGE = ("Использование: python3 batch_ai.py enhance|analyze <папка|шаблон|@список>... "
+         "[--provider claude|openai] [--workers N] [--force]")
+
+
+def collect_paths(targets):
+    """Заметки из папок (рекурсивно), glob-шаблонов и файлов-списков (@путь)"""
+    paths = []
+    for target in targets:
+        if target.startswith('@'):
+            with open(target[1:], 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+            paths.extend(collect_paths([line for line in lines if line and not line.startswith('#')]))
+        elif os.path.isdir(target):
+            paths.extend(entry.path for entry in vault_walker.walk(target))
+        elif glob.has_magic(target):
+            paths.extend(glob.glob(target, recursive=True))
+        elif os.path.isfile(target):
+            paths.append(target)
+        else:
+            print(f"⚠️  Не найдено: {target}")
+
+    # Отчёты AI-анализа сами не анализируем
+    unique = dict.fromkeys(os.path.abspath(path) for path in paths
+                           if path.endswith('.md') and not path.endswith(' - AI Анализ.md'))
+    return sorted(unique)
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST.with_name(MANIFEST.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST)
+
+
+def run_batch(mode, paths, provider, workers=DEFAULT_WORKERS, force=False):
+    """
+    Обработать заметки paths в режиме mode ('enhance' или 'analyze').
+    Возвращает статистику: done, skipped, failed, seconds; skipped — заметки
+    без изменений (по манифесту или по хэшу в AI секции заметки).
+    """
+    manifest = load_manifest()
+    done_hashes = manifest.setdefault(mode, {})
+
+    pending = []
+    for path in paths:
+        if not force and done_hashes.get(path) == file_hash(path):
+            continue
+        pending.append(path)
+    stats = {'done': 0, 'skipped': len(paths) - len(pending), 'failed': 0, 'seconds': 0.0}
+
+    print(f"📚 Заметок: {len(paths)}, к обработке: {len(pending)}, "
+          f"без изменений: {stats['skipped']}")
+    if not pending:
+        return stats
+
+    def process(path):
+        if mode == 'enhance':
+            return enhance_note_inline(path, provider, echo=False, force=force)
+        return bool(analyze_report(path, provider, echo=False))
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process, path): path for path in pending}
+        for count, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                ok = False
+                print(f"❌ Ошибка {Path(path).name}: {e}")
+
+            if ok == SKIPPED:
+                stats['skipped'] += 1
+                done_hashes[path] = file_hash(path)
+            elif ok:
+                stats['done'] += 1
+                # Для enhance это уже заметка с AI секцией — её и увидит следующий запуск
+                done_hashes[path] = file_hash(path)
+            else:
+                stats['failed'] += 1
+            mark = '⏭️ ' if ok == SKIPPED else '✅' if ok else '❌'
+            print(f"[{count}/{len(pending)}] {mark} {Path(path).name}")
+
+    stats['seconds'] = time.monotonic() - started
+    save_manifest(manifest)
+    return stats
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ('enhance', 'analyze'):
+        print(USAGE)
+        sys.exit(1)
+
+    mode, targets = args[0], []
+    provider_name, workers, force = None, DEFAULT_WORKERS, False
+    rest = iter(args[1:])
+    for arg in rest:
+        if arg == '--provider':
+            provider_name = next(rest, None)
+        elif arg == '--workers':
+            workers = int(next(rest, DEFAULT_WORKERS))
+        elif arg == '--force':
+            force = True
+        else:
+            targets.append(arg)
+
+    paths = collect_paths(targets)
+    if not paths:
+        print("ℹ️  Заметок не найдено")
+        return
+
+    try:
+        provider = get_provider(provider_name)
+    except (ValueError, ImportError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    with provider:
+        stats = run_batch(mode, paths, provider, workers, force)
+        cache_stats = provider.cache.stats() if provider.cache else None
+
+    if stats['seconds']:
+        rate = stats['done'] / stats['seconds'] * 60
+        print(f"\n📈 Обработано: {stats['done']} за {stats['seconds']:.1f} с "
+              f"({rate:.1f} заметок/мин), пропущено: {stats['skipped']}, "
+              f"ошибок: {stats['failed']}")
+    if cache_stats:
+        print(f"💾 Кэш ответов: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}")
+
+
+if __name__ == "__main__":
+    main()
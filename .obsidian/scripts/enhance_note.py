@@ -5,16 +5,47 @@ AI помощник для работы с заметкой
 Поддерживает Claude (Anthropic) и ChatGPT (OpenAI).
 """
 
+import hashlib
 import os
+import re
 import sys
 
 # Добавляем путь к скриптам
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from ai_provider import get_provider
+from ai_provider import get_provider, write_stream
+from prompt_builder import PromptBuilder
 
+AI_SECTION = "## AI Помощник"
+# Скрытая метка в AI секции: хэш текста заметки, по которому она создана
+BODY_HASH_RE = re.compile(r'<!-- ai-body-hash: ([0-9a-f]{64}) -->')
 
-def enhance_note_inline(file_path, provider):
-    """Улучшить заметку, добавив AI анализ в конец"""
+# Результаты enhance_note_inline (None — ошибка)
+ENHANCED = "enhanced"
+SKIPPED = "skipped"
+
+
+def split_ai_section(content):
+    """Заметка → (текст без AI секции, AI секция или '')"""
+    if AI_SECTION not in content:
+        return content, ""
+    body, _, section = content.partition(AI_SECTION)
+    body = body.rstrip()
+    # Убрать разделитель перед секцией
+    if body.endswith("---"):
+        body = body[:-3].rstrip()
+    return body, section
+
+
+def body_hash(body):
+    return hashlib.sha256(body.rstrip().encode('utf-8')).hexdigest()
+
+
+def enhance_note_inline(file_path, provider, echo=True, force=False):
+    """
+    Улучшить заметку, добавив AI анализ в конец (echo — печатать ответ по мере генерации).
+    Если текст заметки не менялся с прошлого анализа, API не вызывается (force — всё равно обновить).
+    Возвращает ENHANCED, SKIPPED или None при ошибке.
+    """
 
     # Читаем заметку
     try:
@@ -22,19 +53,22 @@ def enhance_note_inline(file_path, provider):
             content = f.read()
     except Exception as e:
         print(f"Ошибка чтения файла: {e}")
-        return False
+        return None
 
     # Проверяем, есть ли уже AI анализ
-    if "## AI Помощник" in content:
+    content, section = split_ai_section(content)
+    content_hash = body_hash(content)
+    if section:
+        match = BODY_HASH_RE.search(section)
+        if match and match.group(1) == content_hash and not force:
+            print("AI анализ актуален: заметка не менялась. Пропускаю.")
+            return SKIPPED
         print("AI анализ уже есть в заметке. Обновляю...")
-        content = content.split("## AI Помощник")[0].rstrip()
-        # Убрать разделитель перед секцией
-        if content.endswith("---"):
-            content = content[:-3].rstrip()
 
     system_prompt = "Ты эксперт по работе со знаниями и заметками."
 
-    user_prompt = f"""Проанализируй эту заметку и предоставь:
+    builder = PromptBuilder.for_provider(provider, max_tokens=1500)
+    builder.add("""Проанализируй эту заметку и предоставь:
 
 1. **Краткое резюме** (2-3 предложения)
 2. **Ключевые идеи** (список)
@@ -48,62 +82,69 @@ def enhance_note_inline(file_path, provider):
 
 Заметка:
 ---
-{content}
+""")
+    builder.add_document(content)
+    builder.add("""
 ---
 
-Ответ должен быть кратким, структурированным, на русском языке, в формате Markdown."""
+Ответ должен быть кратким, структурированным, на русском языке, в формате Markdown.""")
+    user_prompt = builder.build()
+    print(builder.report())
 
     try:
         print(f"[{provider.name}] Анализирую заметку...")
 
-        ai_section = provider.chat(
+        deltas = provider.chat(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             max_tokens=1500,
-            temperature=0.7
+            temperature=0.7,
+            stream=True
         )
 
-        # Добавляем AI анализ в конец заметки
-        enhanced_content = f"""{content}
+        # Добавляем AI анализ в конец заметки по мере генерации,
+        # заметка заменяется атомарно после получения всего ответа
+        header = f"""{content}
 
 ---
 
-## AI Помощник
+{AI_SECTION}
 
 > Провайдер: **{provider.name}** ({provider.model})
+<!-- ai-body-hash: {content_hash} -->
 
-{ai_section}
+"""
+        footer = """
 
 ---
 
 *AI анализ создан автоматически. Для обновления: Cmd+P -> "AI: Enhance Note"*
 """
-
-        # Сохраняем
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(enhanced_content)
+        write_stream(file_path, deltas, prefix=header, suffix=footer, echo=echo)
 
         print(f"[{provider.name}] Заметка улучшена! AI анализ добавлен.")
-        return True
+        return ENHANCED
 
     except Exception as e:
         print(f"Ошибка: {e}")
-        return False
+        return None
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Использование: python3 enhance_note.py <путь_к_заметке> [claude|openai]")
+    force = "--force" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    if not args:
+        print("Использование: python3 enhance_note.py <путь_к_заметке> [claude|openai] [--force]")
         sys.exit(1)
 
-    file_path = sys.argv[1]
+    file_path = args[0]
 
     if not os.path.exists(file_path):
         print(f"Файл не найден: {file_path}")
         sys.exit(1)
 
     # Определяем провайдера
-    provider_name = sys.argv[2] if len(sys.argv) > 2 else None
+    provider_name = args[1] if len(args) > 1 else None
 
     try:
         provider = get_provider(provider_name)
@@ -111,7 +152,8 @@ def main():
         print(f"Ошибка: {e}")
         sys.exit(1)
 
-    enhance_note_inline(file_path, provider)
+    with provider:
+        enhance_note_inline(file_path, provider, force=force)
 
 
 if __name__ == "__main__":
@@ -7,57 +7,195 @@
 import os
 import sys
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from pathlib import Path
-from openai import OpenAI
-from collections import defaultdict
 
-def find_related_notes(vault_path, source_folder="2. Исчезающие"):
-    """Найти все заметки и сгруппировать по темам"""
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ai_provider import CACHE_DIR, get_provider
+import near_duplicates
+from near_duplicates import NearDuplicates, clusters
+from note_index import NoteIndex
+from prompt_builder import PromptBuilder
+from similarity import SimilarityIndex
+import vault_walker
 
-    folder_path = os.path.join(vault_path, source_folder)
-    if not os.path.exists(folder_path):
-        # Пробуем старую папку
-        folder_path = os.path.join(vault_path, "Изчезающие заметки")
+# Заметки без похожих (по TF-IDF) в промпт группировки не попадают
+GROUP_MIN_SIMILARITY = 0.1
+SIMILARITY_INDEX = CACHE_DIR / "merge_similarity.pickle"
+
+# Группировка: "llm" — одним промптом через AI, "local" — кластеризация по TF-IDF
+GROUPING = os.environ.get("MERGE_GROUPING", "llm")
+# Средняя близость заметок, при которой кластеры ещё объединяются
+CLUSTER_MIN_SIMILARITY = 0.2
+NAMING_CONCURRENCY = 4
+
+# Сколько черновиков создаётся одновременно
+DRAFT_WORKERS = 4
+
+# Абзацы короче не сравниваются (заголовки, короткие строки)
+PARAGRAPH_MIN_CHARS = 80
+
+def find_related_notes(vault_path, source_folder=None):
+    """Найти все заметки и сгруппировать по темам (по умолчанию — из папки входящих)"""
+
+    if source_folder is None:
+        folder_path = str(vault_walker.role_dir("inbox", vault_path))
+    else:
+        folder_path = os.path.join(vault_path, source_folder)
 
     if not os.path.exists(folder_path):
-        print(f"❌ Папка не найдена: {source_folder}")
+        print(f"❌ Папка не найдена: {os.path.relpath(folder_path, vault_path)}")
         return {}
 
-    notes = []
-    for file in Path(folder_path).rglob("*.md"):
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            notes.append({
-                'path': str(file),
-                'name': file.stem,
-                'content': content,
-                'size': len(content)
-            })
-        except Exception as e:
-            print(f"⚠️  Не удалось прочитать {file}: {e}")
+    rel_folder = os.path.relpath(folder_path, vault_path)
+    with NoteIndex(vault_path) as index:
+        index.refresh([rel_folder])
+        notes = [
+            {
+                'path': note['abs_path'],
+                'hash': note['hash'],
+                'name': note['name'],
+                'content': note['content'],
+                'size': len(note['content'])
+            }
+            for note in index.notes(rel_folder)
+        ]
 
     return notes
 
-def group_notes_by_topic(notes, api_key):
-    """Группировать заметки по темам через AI"""
+def note_similarities(notes):
+    """Матрица попарной близости заметок по содержимому (в порядке notes)"""
+    with SimilarityIndex(SIMILARITY_INDEX) as similarity:
+        similarity.update(notes)
+        paths, matrix = similarity.similarities([note['path'] for note in notes])
+    position = {path: i for i, path in enumerate(paths)}
+    order = [position[note['path']] for note in notes]
+    return [[matrix[i][j] for j in order] for i in order]
+
+def cluster_notes(matrix, threshold=CLUSTER_MIN_SIMILARITY):
+    """
+    Агломеративная кластеризация (средняя связь): сливаем самые близкие
+    кластеры, пока их средняя близость не ниже threshold.
+    Возвращает кластеры из двух и более заметок — списки номеров.
+    """
+    members = {i: [i] for i in range(len(matrix))}
+    # Близость кластеров: сумма попарных близостей их заметок
+    totals = {i: {j: matrix[i][j] for j in range(len(matrix)) if j != i} for i in members}
+
+    while True:
+        best, pair = threshold, None
+        for a, row in totals.items():
+            for b, total in row.items():
+                if a < b:
+                    average = total / (len(members[a]) * len(members[b]))
+                    if average >= best:
+                        best, pair = average, (a, b)
+        if pair is None:
+            break
+
+        a, b = pair
+        members[a].extend(members.pop(b))
+        del totals[b]
+        for c, row in totals.items():
+            if c != a:
+                row[a] = row[a] + row.pop(b)
+                totals[a][c] = row[a]
+        totals[a].pop(b)
+
+    return [sorted(group) for group in members.values() if len(group) > 1]
+
+def medoid(group, matrix):
+    """Заметка группы, в среднем ближайшая к остальным"""
+    return max(group, key=lambda i: sum(matrix[i][j] for j in group))
+
+def name_clusters(notes, groups, provider):
+    """Короткое название черновика для каждого кластера — по запросу на кластер"""
+    requests = []
+    for group in groups:
+        notes_list = "\n".join(
+            f"- {notes[i]['name']}: {notes[i]['content'][:150].replace(chr(10), ' ')}"
+            for i in group
+        )
+        requests.append({
+            'system_prompt': "Ты эксперт по организации знаний и заметок.",
+            'user_prompt': f"Придумай короткое название черновика (до 6 слов), "
+                           f"объединяющего эти заметки. Ответь только названием.\n\n{notes_list}",
+            'max_tokens': 30,
+            'temperature': 0.3,
+        })
+
+    names = []
+    for result in provider.batch_chat(requests, concurrency=NAMING_CONCURRENCY):
+        name = (result['response'] or "").strip().splitlines()
+        names.append(re.sub(r'[\\/:*?"<>|]', '', name[0]).strip('«»"\'# .')[:80] if name else None)
+    return names
+
+def group_notes_locally(notes, matrix, provider=None):
+    """
+    Группировка без большого промпта: кластеры по близости текста.
+    Если передан provider — AI только называет кластеры, иначе черновик
+    называется по самой типичной заметке. Ответ в формате AI-группировки.
+    """
+    print("🧮 Кластеризую заметки локально...")
+    groups = cluster_notes(matrix)
+    if not groups:
+        return {}
+
+    names = name_clusters(notes, groups, provider) if provider else [None] * len(groups)
+
+    result = []
+    for group, name in zip(groups, names):
+        center = medoid(group, matrix)
+        pairs = [(i, j) for i in group for j in group if i < j]
+        average = sum(matrix[i][j] for i, j in pairs) / len(pairs)
+        result.append({
+            'draft_name': name or f"Черновик — {notes[center]['name']}",
+            'notes': [notes[i]['name'] for i in group],
+            'reason': f"Похожий текст (средняя близость {average:.0%})"
+        })
+    return {'groups': result}
+
+def group_notes_by_topic(notes, provider, grouping=None, ai_names=True):
+    """
+    Группировать заметки по темам.
+
+    grouping: "llm" — через AI одним промптом, "local" — локальная
+    кластеризация (по умолчанию MERGE_GROUPING). ai_names — называть
+    локальные кластеры через AI.
+    """
 
     if not notes:
         return {}
 
+    # Локальная близость: одиночек в промпт не отдаём, остальным — подсказки
+    matrix = note_similarities(notes)
+    if (grouping or GROUPING) == "local":
+        return group_notes_locally(notes, matrix, provider if ai_names else None)
+
+    neighbours = {
+        i: [j for j, score in enumerate(row) if j != i and score >= GROUP_MIN_SIMILARITY]
+        for i, row in enumerate(matrix)
+    }
+    candidates = [i for i in range(len(notes)) if neighbours[i]]
+    if not candidates:
+        print("ℹ️  Похожих заметок не найдено")
+        return {}
+    print(f"🔎 Заметок с похожими: {len(candidates)} из {len(notes)}")
+
     # Подготовка списка заметок
+    number = {i: n for n, i in enumerate(candidates, 1)}
     notes_list = ""
-    for i, note in enumerate(notes, 1):
+    for i in candidates:
+        note = notes[i]
         preview = note['content'][:200].replace('\n', ' ')
-        notes_list += f"\n{i}. **{note['name']}**\n   Содержание: {preview}...\n"
-
-    client = OpenAI(api_key=api_key)
+        similar = ", ".join(str(number[j]) for j in neighbours[i])
+        notes_list += f"\n{number[i]}. **{note['name']}**\n   Содержание: {preview}...\n"
+        notes_list += f"   Похожа на: {similar}\n"
 
     prompt = f"""Ты эксперт по организации заметок.
 
-У меня есть {len(notes)} заметок:
+У меня есть {len(candidates)} заметок (для каждой указаны номера похожих по тексту):
 
 {notes_list}
 
@@ -86,17 +224,12 @@ def group_notes_by_topic(notes, api_key):
     try:
         print("🤖 Анализирую заметки и группирую по темам...")
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Ты эксперт по организации знаний и заметок."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-
-        result = response.choices[0].message.content.strip()
+        result = provider.chat(
+            system_prompt="Ты эксперт по организации знаний и заметок.",
+            user_prompt=prompt,
+            max_tokens=2000,
+            temperature=0.7
+        ).strip()
 
         # Извлекаем JSON
         if "```json" in result:
@@ -113,22 +246,103 @@ def group_notes_by_topic(notes, api_key):
         print(f"❌ Ошибка при группировке: {e}")
         return {}
 
-def create_draft(notes_to_merge, draft_name, vault_path, api_key):
-    """Создать черновик из нескольких заметок"""
-
-    # Объединяем содержимое
-    combined_content = ""
-    for note in notes_to_merge:
-        combined_content += f"\n\n---\n\n## Из заметки: {note['name']}\n\n{note['content']}\n"
-
-    # Просим AI структурировать
-    client = OpenAI(api_key=api_key)
-
-    prompt = f"""Ты эксперт по структурированию заметок.
+def collapse_duplicates(notes):
+    """
+    Свернуть почти одинаковые заметки и абзацы перед отправкой в AI.
+
+    Из группы похожих заметок остаётся самая длинная, из похожих абзацев —
+    первый. Возвращает (заметки с очищенным текстом, свёрнутые пары
+    [(что свёрнуто, во что, сходство)]).
+    """
+    collapsed = []
+
+    detector = NearDuplicates()
+    for i, note in enumerate(notes):
+        detector.add(i, note['content'])
+
+    kept = []
+    for group in clusters(range(len(notes)), detector.pairs()):
+        keeper = max(group, key=lambda i: len(notes[i]['content']))
+        kept.append(keeper)
+        for i in group:
+            if i != keeper:
+                similarity = detector.similarity(notes[i]['content'], notes[keeper]['content'])
+                collapsed.append((f"[[{notes[i]['name']}]]", f"[[{notes[keeper]['name']}]]", similarity))
+    kept.sort()
+
+    # Абзацы сравниваем между всеми оставшимися заметками
+    paragraphs = []   # (номер заметки, абзац)
+    detector = NearDuplicates(near_duplicates.PARAGRAPH_THRESHOLD,
+                              near_duplicates.PARAGRAPH_SHINGLE_SIZE)
+    for i in kept:
+        for paragraph in re.split(r'\n\s*\n', notes[i]['content']):
+            if len(paragraph.strip()) >= PARAGRAPH_MIN_CHARS:
+                detector.add(len(paragraphs), paragraph)
+            paragraphs.append((i, paragraph))
+
+    long_paragraphs = detector.keys
+    dropped = set()
+    for group in clusters(long_paragraphs, detector.pairs()):
+        first = group[0]
+        for other in group[1:]:
+            dropped.add(other)
+            note_index, paragraph = paragraphs[other]
+            similarity = detector.similarity(paragraph, paragraphs[first][1])
+            preview = paragraph.strip().replace('\n', ' ')[:60]
+            collapsed.append((f"абзац «{preview}…» из [[{notes[note_index]['name']}]]",
+                              f"[[{notes[paragraphs[first][0]]['name']}]]", similarity))
+
+    # Заметки без выброшенных абзацев остаются байт в байт (промпт попадает в кэш)
+    trimmed = {paragraphs[n][0] for n in dropped}
+    result = []
+    for i in kept:
+        content = notes[i]['content']
+        if i in trimmed:
+            content = "\n\n".join(paragraph for n, (note_index, paragraph) in enumerate(paragraphs)
+                                   if note_index == i and n not in dropped)
+        result.append({'name': notes[i]['name'], 'content': content})
+
+    return result, collapsed
+
+def archive_notes(notes, vault_path):
+    """Переместить исходные заметки в архив; уже перенесённые пропускаются"""
+    archive_folder = os.path.join(vault_path, "7. Архив", "Объединённые заметки")
+    os.makedirs(archive_folder, exist_ok=True)
+
+    archived = []
+    for note in notes:
+        if not os.path.exists(note['path']):
+            continue
+        archive_path = os.path.join(archive_folder, os.path.basename(note['path']))
+        os.rename(note['path'], archive_path)
+        archived.append(note['name'])
+        print(f"   📦 Архивировано: {note['name']}")
+    return archived
+
+def create_draft(notes_to_merge, draft_name, vault_path, provider, archive=True, log=print):
+    """
+    Создать черновик из нескольких заметок.
+    archive=False — не архивировать исходники (это делает вызывающий код).
+    log — куда писать строки хода работы (из потоков — в список, не в консоль).
+    """
+
+    # Дубликаты сворачиваем локально, чтобы не платить за них токенами
+    unique_notes, collapsed = collapse_duplicates(notes_to_merge)
+    for what, into, similarity in collapsed:
+        log(f"   🧬 Свёрнуто: {what} ≈ {into} ({similarity:.0%})")
+
+    # Объединяем содержимое: каждая заметка ужимается под общий бюджет
+    builder = PromptBuilder.for_provider(provider, max_tokens=3000)
+    builder.add("""Ты эксперт по структурированию заметок.
 
 Объедини эти заметки в один структурированный черновик:
 
-{combined_content}
+""")
+    for note in unique_notes:
+        builder.add(f"\n\n---\n\n## Из заметки: {note['name']}\n\n")
+        builder.add_document(note['content'])
+        builder.add("\n")
+    builder.add(f"""
 
 **Твоя задача:**
 
@@ -140,22 +354,30 @@ def create_draft(notes_to_merge, draft_name, vault_path, api_key):
 
 **Формат:** Markdown, на русском языке.
 **Название черновика:** {draft_name}
-"""
+""")
+    prompt = builder.build()
+
+    if collapsed:
+        original_size = sum(len(note['content']) for note in notes_to_merge)
+        combined_size = sum(len(note['content']) for note in unique_notes)
+        log(f"   ✂️  Текст для AI: {original_size} → {combined_size} символов")
+    log(f"   {builder.report()}")
 
     try:
-        print(f"🤖 Создаю черновик: {draft_name}")
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Ты эксперт по структурированию информации."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=3000
-        )
+        log(f"🤖 Создаю черновик: {draft_name}")
 
-        structured_content = response.choices[0].message.content.strip()
+        structured_content = provider.chat(
+            system_prompt="Ты эксперт по структурированию информации.",
+            user_prompt=prompt,
+            max_tokens=3000,
+            temperature=0.7
+        ).strip()
+
+        duplicates_section = ""
+        if collapsed:
+            duplicates_section = "\nСвёрнутые дубликаты:\n" + "\n".join(
+                f"- {what} ≈ {into} ({similarity:.0%})" for what, into, similarity in collapsed
+            ) + "\n"
 
         # Добавляем метаданные
         today = datetime.now().strftime('%Y-%m-%d')
@@ -176,52 +398,50 @@ source_notes: {', '.join([n['name'] for n in notes_to_merge])}
 
 Черновик создан из заметок:
 {chr(10).join([f'- [[{n["name"]}]]' for n in notes_to_merge])}
-
+{duplicates_section}
 Дата создания: {today}
 """
 
         # Сохраняем черновик
-        draft_path = os.path.join(vault_path, "3. Черновики", f"{draft_name}.md")
+        draft_path = os.path.join(vault_walker.role_dir("drafts", vault_path), f"{draft_name}.md")
         os.makedirs(os.path.dirname(draft_path), exist_ok=True)
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
+        # Пишем во временный файл: черновик появляется целиком или никак
+        tmp_path = os.path.join(os.path.dirname(draft_path), f".{draft_name}.md.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             f.write(draft)
+        os.replace(tmp_path, draft_path)
 
-        print(f"✅ Черновик создан: {draft_path}")
+        log(f"✅ Черновик создан: {draft_path}")
 
         # Перемещаем исходные заметки в архив
-        archive_folder = os.path.join(vault_path, "7. Архив", "Объединённые заметки")
-        os.makedirs(archive_folder, exist_ok=True)
-
-        for note in notes_to_merge:
-            archive_path = os.path.join(archive_folder, os.path.basename(note['path']))
-            os.rename(note['path'], archive_path)
-            print(f"   📦 Архивировано: {note['name']}")
+        if archive:
+            archive_notes(notes_to_merge, vault_path)
 
         return draft_path
 
     except Exception as e:
-        print(f"❌ Ошибка при создании черновика: {e}")
+        log(f"❌ Ошибка при создании черновика: {e}")
         return None
 
 def main():
     vault_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    # Получаем API ключ
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        env_file = os.path.join(vault_path, '.env')
-        if os.path.exists(env_file):
-            with open(env_file, 'r') as f:
-                for line in f:
-                    if line.startswith('OPENAI_API_KEY='):
-                        api_key = line.split('=', 1)[1].strip()
-                        break
-
-    if not api_key:
-        print("❌ OPENAI_API_KEY не найден")
+    # Получаем AI провайдера (один клиент на весь запуск)
+    try:
+        provider = get_provider("openai")
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
         sys.exit(1)
 
+    grouping = "local" if "--local" in sys.argv else None
+    ai_names = "--no-ai-names" not in sys.argv
+
+    with provider:
+        run(vault_path, provider, grouping, ai_names)
+
+def run(vault_path, provider, grouping=None, ai_names=True):
+    """Найти, сгруппировать и объединить заметки"""
     print("📊 Объединение исчезающих заметок в черновики...")
 
     # Находим заметки
@@ -233,18 +453,32 @@ def main():
         return
 
     # Группируем по темам
-    groups = group_notes_by_topic(notes, api_key)
+    groups = group_notes_by_topic(notes, provider, grouping, ai_names)
+
+    # Заметки без похожих (и не попавшие в группы) не объединяются — показываем их
+    grouped = {name for group in (groups or {}).get('groups', []) for name in group['notes']}
+    ungrouped = [note['name'] for note in notes if note['name'] not in grouped]
+    if ungrouped:
+        print(f"\n📎 Без группы (остаются на месте): {len(ungrouped)}")
+        for name in ungrouped:
+            print(f"   - {name}")
 
     if not groups or 'groups' not in groups:
         print("ℹ️  Группы не найдены")
         return
 
-    # Создаём черновики
-    created_drafts = []
+    # Собираем группы; одинаковые названия разводим, чтобы черновики не затирали друг друга
+    tasks = []
+    used_names = set()
     for group in groups['groups']:
         draft_name = group['draft_name']
         note_names = group['notes']
 
+        base_name, copy = draft_name, 2
+        while draft_name.lower() in used_names:
+            draft_name = f"{base_name} ({copy})"
+            copy += 1
+
         # Находим заметки по именам
         notes_to_merge = [n for n in notes if n['name'] in note_names]
 
@@ -252,14 +486,60 @@ def main():
             print(f"\n📝 Группа: {draft_name}")
             print(f"   Заметок: {len(notes_to_merge)}")
             print(f"   Причина: {group.get('reason', 'Не указана')}")
+            used_names.add(draft_name.lower())
+            tasks.append((draft_name, notes_to_merge))
+
+    if not tasks:
+        print("\nℹ️  Группы без заметок — черновики не созданы")
+        return
+
+    # Черновики создаём параллельно; архивируем в основном потоке и только
+    # после успешной записи черновика, так что сбой группы не трогает её заметки
+    # Вывод групп собирается в потоках и печатается целиком из основного потока
+    def draft_task(draft_name, notes_to_merge):
+        started = time.monotonic()
+        lines = []
+        draft_path = create_draft(notes_to_merge, draft_name, vault_path, provider,
+                                  archive=False, log=lines.append)
+        return draft_path, time.monotonic() - started, lines
+
+    print(f"\n🚀 Создаю {len(tasks)} черновиков (параллельно до {DRAFT_WORKERS})...")
+    started = time.monotonic()
+    created_drafts, failed_drafts, archived = [], [], []
+    slowest = 0.0
+
+    with ThreadPoolExecutor(max_workers=min(DRAFT_WORKERS, len(tasks))) as pool:
+        futures = {pool.submit(draft_task, *task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            draft_name, notes_to_merge = futures[future]
+            try:
+                draft_path, elapsed, lines = future.result()
+            except Exception as e:
+                draft_path, elapsed, lines = None, 0.0, [f"❌ Ошибка при создании черновика: {e}"]
+            slowest = max(slowest, elapsed)
+            for line in lines:
+                print(line)
 
-            draft_path = create_draft(notes_to_merge, draft_name, vault_path, api_key)
             if draft_path:
                 created_drafts.append(draft_name)
+                print(f"[{done}/{len(tasks)}] ✅ {draft_name} ({elapsed:.1f} с)")
+                try:
+                    archived.extend(archive_notes(notes_to_merge, vault_path))
+                except Exception as e:
+                    print(f"⚠️  Ошибка архивации для {draft_name}: {e}")
+            else:
+                failed_drafts.append(draft_name)
+                print(f"[{done}/{len(tasks)}] ❌ {draft_name}")
 
     print(f"\n✅ Создано черновиков: {len(created_drafts)}")
     for draft in created_drafts:
         print(f"   - {draft}")
+    if failed_drafts:
+        print(f"❌ Не удалось создать: {len(failed_drafts)} (заметки остались на месте)")
+        for draft in failed_drafts:
+            print(f"   - {draft}")
+    print(f"📦 Архивировано заметок: {len(archived)}")
+    print(f"⏱️  Время: {time.monotonic() - started:.1f} с (самая долгая группа: {slowest:.1f} с)")
 
 if __name__ == "__main__":
     main()
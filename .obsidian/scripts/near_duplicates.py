@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Поиск почти одинаковых текстов: MinHash + LSH
+Текст разбивается на шинглы (последовательности слов), сигнатура MinHash
+оценивает их сходство по Жаккару, а LSH по полосам сигнатуры находит
+кандидатов без сравнения всех пар. Кандидаты проверяются точным Жаккаром.
+"""
+
+import random
+import re
+import zlib
+
+SHINGLE_SIZE = 5
+PARAGRAPH_SHINGLE_SIZE = 3   # абзацы короткие: шинглы короче, порог ниже
+PARAGRAPH_THRESHOLD = 0.7
+NUM_PERM = 64
+BANDS = 16          # 16 полос по 4 значения: кандидаты от сходства ~0.5
+THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(42)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Множество хэшей шинглов из size подряд идущих слов (регистр не важен)"""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def signature(shingle_set):
+    """MinHash-сигнатура множества шинглов"""
+    return [
+        min((a * value + b) % _PRIME for value in shingle_set)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicates:
+    """
+    Детектор почти дубликатов.
+
+    add(ключ, текст) — добавить текст; pairs() — пары ключей со сходством
+    не ниже threshold: [(первый добавленный, второй, сходство)].
+    """
+
+    def __init__(self, threshold=THRESHOLD, shingle_size=SHINGLE_SIZE, bands=BANDS):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.keys = []
+        self._shingles = []
+        self._buckets = {}
+
+    def similarity(self, text_a, text_b):
+        """Точное сходство двух текстов по Жаккару (с шинглами детектора)"""
+        return jaccard(shingles(text_a, self.shingle_size), shingles(text_b, self.shingle_size))
+
+    def add(self, key, text):
+        shingle_set = shingles(text, self.shingle_size)
+        self.keys.append(key)
+        self._shingles.append(shingle_set)
+        if not shingle_set:
+            return
+
+        index = len(self.keys) - 1
+        sig = signature(shingle_set)
+        for band in range(self.bands):
+            band_key = (band, tuple(sig[band * self.rows:(band + 1) * self.rows]))
+            self._buckets.setdefault(band_key, []).append(index)
+
+    def pairs(self):
+        candidates = set()
+        for members in self._buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    candidates.add((first, second))
+
+        result = []
+        for first, second in sorted(candidates):
+            similarity = jaccard(self._shingles[first], self._shingles[second])
+            if similarity >= self.threshold:
+                result.append((self.keys[first], self.keys[second], similarity))
+        return result
+
+
+def clusters(keys, pairs):
+    """Группы ключей, связанных парами (объединение множеств), в порядке keys"""
+    parent = {key: key for key in keys}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for first, second, _ in pairs:
+        root_first, root_second = find(first), find(second)
+        if root_first != root_second:
+            parent[root_second] = root_first
+
+    groups = {}
+    for key in keys:
+        groups.setdefault(find(key), []).append(key)
+    return list(groups.values())
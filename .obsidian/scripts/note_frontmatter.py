@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Разбор frontmatter заметок — один парсер для всех скриптов
+Заголовок отделяется от тела одним ограниченным поиском, ключи
+разбираются один раз, результат кэшируется по хэшу содержимого.
+Правки меняют только строки заголовка, тело заметки не переписывается.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# Закрывающий '---' ищется только в начале заметки
+MAX_HEADER_SIZE = 16 * 1024
+
+CACHE_SIZE = 4096
+
+KEY_RE = re.compile(r'^([\w-]+):(.*)$')
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Frontmatter:
+    """
+    Разобранная заметка.
+
+    data — ключи верхнего уровня (key: value) в порядке появления,
+    lines — исходные строки заголовка, body — всё после заголовка,
+    has_header — был ли frontmatter вообще.
+    """
+
+    def __init__(self, lines, body, has_header):
+        self.lines = lines
+        self.body = body
+        self.has_header = has_header
+        self.data = {}
+        self._line_of = {}
+        for i, line in enumerate(lines):
+            match = KEY_RE.match(line)
+            if match and match.group(1) not in self.data:
+                self.data[match.group(1)] = match.group(2).strip().strip('"\'')
+                self._line_of[match.group(1)] = i
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def render(self, lines=None):
+        """Собрать заметку обратно из строк заголовка и тела"""
+        lines = self.lines if lines is None else lines
+        if not self.has_header:
+            return self.body
+        return '---\n' + '\n'.join(lines) + '\n---\n' + self.body
+
+
+def split(content):
+    """
+    Разделить заметку на (строки заголовка, тело, есть ли заголовок).
+    Заголовок — между '---' в первой строке и следующей строкой '---'.
+    """
+    if not content.startswith('---\n'):
+        return [], content, False
+
+    end = content.find('\n---', 3, MAX_HEADER_SIZE)
+    while end != -1:
+        after = end + 4
+        if after == len(content) or content[after] == '\n':
+            header = content[4:end]
+            body = content[after + 1:]
+            return header.split('\n') if header else [], body, True
+        end = content.find('\n---', end + 1, MAX_HEADER_SIZE)
+
+    return [], content, False
+
+
+def parse(content):
+    """Разобрать frontmatter (с кэшем по sha1 содержимого)"""
+    key = hashlib.sha1(content.encode('utf-8')).digest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    lines, body, has_header = split(content)
+    result = Frontmatter(lines, body, has_header)
+
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def update(content, values, after=None):
+    """
+    Вернуть заметку с изменёнными ключами заголовка.
+
+    Существующие ключи заменяются на месте, новые вставляются после
+    ключа after (или в конец заголовка). Без заголовка — content как есть.
+    """
+    fm = parse(content)
+    if not fm.has_header:
+        return content
+
+    lines = list(fm.lines)
+    new_lines = []
+    for key, value in values.items():
+        if key in fm._line_of:
+            lines[fm._line_of[key]] = f"{key}: {value}"
+        else:
+            new_lines.append(f"{key}: {value}")
+
+    if new_lines:
+        position = fm._line_of[after] + 1 if after in fm._line_of else len(lines)
+        lines[position:position] = new_lines
+
+    return fm.render(lines)
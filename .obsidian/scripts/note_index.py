@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Индекс заметок vault в SQLite
+Хранит содержимое, хэш, frontmatter, wikilinks и заголовки каждой .md заметки.
+Обновляется инкрементально: перечитываются только файлы с новым mtime/размером.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import note_frontmatter
+import vault_walker
+
+# Путь к vault
+VAULT_PATH = Path(__file__).parent.parent.parent
+
+
+def parse_links(content):
+    """Wikilinks [[...]] в порядке появления"""
+    return re.findall(r'\[\[(.*?)\]\]', content)
+
+
+def parse_headings(content):
+    """Заголовки Markdown как [уровень, текст]"""
+    return [[len(m.group(1)), m.group(2).strip()]
+            for m in re.finditer(r'^(#{1,6})\s+(.+)$', content, re.MULTILINE)]
+
+
+class NoteIndex:
+    """
+    Индекс .md заметок под root.
+
+    refresh() обходит папки, stat-ит файлы и перечитывает только изменённые;
+    notes() отдаёт заметки из индекса без чтения файлов.
+    """
+
+    def __init__(self, root=VAULT_PATH, db_path=None):
+        self.root = Path(root)
+        self.db_path = Path(db_path or self.root / ".obsidian" / "cache" / "note_index.sqlite")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            " path TEXT PRIMARY KEY,"
+            " mtime REAL NOT NULL,"
+            " ctime REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " frontmatter TEXT NOT NULL,"
+            " links TEXT NOT NULL,"
+            " headings TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def refresh(self, folders=None):
+        """
+        Обновить индекс по папкам folders (пути относительно root),
+        по умолчанию — по всему vault. Возвращает статистику обновления.
+        """
+        folders = folders if folders is not None else [""]
+        known = {
+            row[0]: (row[1], row[2])
+            for row in self._conn.execute("SELECT path, mtime, size FROM notes")
+        }
+        stats = {'scanned': 0, 'updated': 0, 'removed': 0}
+        seen = set()
+
+        # Один обход scandir: stat каждого файла берётся из DirEntry
+        for entry in vault_walker.walk(self.root, folders):
+            rel_path = entry.rel_path
+            if rel_path in seen:
+                continue
+            seen.add(rel_path)
+            stats['scanned'] += 1
+
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if known.get(rel_path) == (st.st_mtime, st.st_size):
+                continue
+
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"⚠️  Не удалось прочитать {entry.path}: {e}")
+                continue
+
+            self._upsert(rel_path, st, content)
+            stats['updated'] += 1
+
+        # Удаляем из индекса исчезнувшие файлы внутри обойдённых папок
+        for rel_path in known:
+            if rel_path in seen:
+                continue
+            if any(self._in_folder(rel_path, folder) for folder in folders):
+                self._conn.execute("DELETE FROM notes WHERE path = ?", (rel_path,))
+                stats['removed'] += 1
+
+        self._conn.commit()
+        return stats
+
+    @staticmethod
+    def _in_folder(rel_path, folder):
+        folder = str(folder).strip('/')
+        return not folder or rel_path.startswith(folder + os.sep)
+
+    def _upsert(self, rel_path, st, content):
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        row = self._conn.execute("SELECT hash FROM notes WHERE path = ?", (rel_path,)).fetchone()
+
+        if row and row[0] == content_hash:
+            # Файл тронут, но содержимое то же — обновляем только stat
+            self._conn.execute(
+                "UPDATE notes SET mtime = ?, ctime = ?, size = ? WHERE path = ?",
+                (st.st_mtime, st.st_ctime, st.st_size, rel_path)
+            )
+            return
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO notes"
+            " (path, mtime, ctime, size, hash, content, frontmatter, links, headings)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                rel_path, st.st_mtime, st.st_ctime, st.st_size, content_hash, content,
+                json.dumps(note_frontmatter.parse(content).data, ensure_ascii=False),
+                json.dumps(parse_links(content), ensure_ascii=False),
+                json.dumps(parse_headings(content), ensure_ascii=False),
+            )
+        )
+
+    COLUMNS = "path, mtime, ctime, size, hash, content, frontmatter, links, headings"
+
+    def _query(self, columns, folder="", modified_since=None, recursive=True):
+        folder = str(folder).strip('/')
+        query = f"SELECT {columns} FROM notes"
+        conditions, params = [], []
+        if folder:
+            prefix = folder + os.sep
+            conditions.append("substr(path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        if modified_since is not None:
+            conditions.append("mtime >= ?")
+            params.append(modified_since)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY path"
+
+        for row in self._conn.execute(query, params):
+            if not recursive and os.path.dirname(row[0]) != folder:
+                continue
+            yield row
+
+    def _note(self, row):
+        rel_path = row[0]
+        return {
+            'path': rel_path,
+            'abs_path': str(self.root / rel_path),
+            'name': Path(rel_path).stem,
+            'mtime': row[1],
+            'ctime': row[2],
+            'size': row[3],
+            'hash': row[4],
+            'content': row[5],
+            'frontmatter': json.loads(row[6]),
+            'links': json.loads(row[7]),
+            'headings': json.loads(row[8]),
+        }
+
+    def notes(self, folder="", modified_since=None, recursive=True):
+        """
+        Заметки из индекса внутри folder (путь относительно root).
+
+        modified_since: timestamp, отбирать только заметки с mtime не раньше.
+        recursive=False — только файлы непосредственно в folder.
+        """
+        return [self._note(row)
+                for row in self._query(self.COLUMNS, folder, modified_since, recursive)]
+
+    def stats(self, folder="", recursive=True):
+        """Только (путь, mtime, размер) заметок в folder — без содержимого"""
+        return list(self._query("path, mtime, size", folder, recursive=recursive))
+
+    def note(self, rel_path):
+        """Одна заметка по пути относительно root или None"""
+        row = self._conn.execute(
+            f"SELECT {self.COLUMNS} FROM notes WHERE path = ?", (str(rel_path),)
+        ).fetchone()
+        return self._note(row) if row else None
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else VAULT_PATH
+    with NoteIndex(root) as index:
+        stats = index.refresh()
+        print(f"📚 Индекс заметок: {stats['scanned']} файлов, "
+              f"обновлено {stats['updated']}, удалено {stats['removed']}")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Поиск множества фраз в тексте за один проход (автомат Ахо-Корасик)
+Фразы ищутся без учёта регистра и только целыми словами;
+из пересекающихся совпадений остаётся самое длинное.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aho_corasick import Automaton
+
+
+class PhraseMatcher:
+    """
+    Автомат по списку фраз (например, имён заметок).
+
+    finditer() отдаёт вхождения (начало, конец, номер фразы) —
+    номер соответствует позиции фразы в исходном списке.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+
+        # Номер образца автомата → номер фразы (пустые фразы пропускаются)
+        self._automaton = Automaton()
+        self._phrase_ids = []
+        for phrase_id, phrase in enumerate(self.phrases):
+            if phrase:
+                self._automaton.add(phrase.lower())
+                self._phrase_ids.append(phrase_id)
+        self._automaton.build()
+
+    def _candidates(self, text):
+        """Все вхождения фраз целыми словами, включая пересекающиеся"""
+        for start, end, pattern_id in self._automaton.iter(text):
+            if end < len(text) and text[end].isalnum():
+                continue
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            yield start, end, self._phrase_ids[pattern_id]
+
+    def finditer(self, text):
+        """Непересекающиеся вхождения по порядку: при пересечении — самое длинное"""
+        candidates = sorted(self._candidates(text.lower()),
+                            key=lambda match: (match[0], match[0] - match[1]))
+        last_end = 0
+        for start, end, phrase_id in candidates:
+            if start >= last_end:
+                last_end = end
+                yield start, end, phrase_id
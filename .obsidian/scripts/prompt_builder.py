@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Сборка промптов с бюджетом токенов
+Инструкции промпта сохраняются как есть, документы (заметки, отчёты)
+ужимаются под бюджет: сначала заголовки, затем начало каждой секции,
+затем целиком самые новые секции; старые секции сокращаются до первых фраз.
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ai_provider import estimate_tokens
+
+# Бюджет входа по умолчанию (токены), AI_PROMPT_BUDGET — переопределить
+DEFAULT_BUDGET = 12000
+
+PREVIEW_CHARS = 200
+CUT_MARK = " […]"
+
+HEADING_RE = re.compile(r'^#{1,6}\s', re.MULTILINE)
+SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+
+def split_sections(text):
+    """Markdown → [(заголовок или '', тело)]; текст до первого заголовка — секция без заголовка"""
+    starts = [m.start() for m in HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        chunk = text[start:end]
+        if HEADING_RE.match(chunk):
+            heading, _, body = chunk.partition('\n')
+        else:
+            heading, body = '', chunk
+        sections.append((heading, body))
+    return sections
+
+
+def chars_for_tokens(text, tokens):
+    """Сколько символов text помещается в tokens токенов (по плотности самого text)"""
+    return int(tokens * len(text) / estimate_tokens(text))
+
+
+def leading_sentences(text, max_chars):
+    """Первые фразы text общей длиной не больше max_chars (хотя бы обрезок первой)"""
+    result = ""
+    for sentence in SENTENCE_RE.split(text.strip()):
+        if not sentence:
+            continue
+        candidate = f"{result} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        result = candidate
+    return result or text.strip()[:max_chars]
+
+
+def fit_markdown(text, budget):
+    """
+    Ужать Markdown до budget токенов.
+
+    Заголовки сохраняются всегда; каждая секция получает превью, затем,
+    от последних секций к первым (новое обычно дописывается в конец),
+    секции раскрываются целиком, а не поместившиеся — до первых фраз.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+
+    sections = split_sections(text)
+    headings_cost = sum(estimate_tokens(heading) for heading, _ in sections)
+    if headings_cost >= budget:
+        return text[:chars_for_tokens(text, max(budget, 1))].rstrip() + CUT_MARK
+
+    bodies = [''] * len(sections)
+    remaining = budget - headings_cost
+    newest_first = range(len(sections) - 1, -1, -1)
+
+    def cost(body):
+        return estimate_tokens(body) if body else 0
+
+    # Превью каждой секции
+    for i in newest_first:
+        body = sections[i][1].strip()
+        if not body:
+            continue
+        preview = leading_sentences(body, PREVIEW_CHARS)
+        if preview != body:
+            preview += CUT_MARK
+        if cost(preview) <= remaining:
+            bodies[i] = preview
+            remaining -= cost(preview)
+
+    # Новые секции — целиком, остальные — сколько поместится первых фраз
+    for i in newest_first:
+        body = sections[i][1].strip()
+        if not body or bodies[i] == body:
+            continue
+        extra = cost(body) - cost(bodies[i])
+        if extra <= remaining:
+            remaining -= extra
+            bodies[i] = body
+            continue
+
+        available = remaining + cost(bodies[i])
+        summary = leading_sentences(body, chars_for_tokens(body, available) - len(CUT_MARK)) + CUT_MARK
+        if cost(summary) <= available and len(summary) > len(bodies[i]):
+            remaining = available - cost(summary)
+            bodies[i] = summary
+
+    parts = []
+    for (heading, _), body in zip(sections, bodies):
+        parts.append('\n'.join(part for part in (heading, body) if part))
+    return '\n\n'.join(part for part in parts if part)
+
+
+class PromptBuilder:
+    """
+    Промпт из частей: add() — текст как есть (инструкции),
+    add_document() — документ, который можно ужать.
+
+    build() делит оставшийся после инструкций бюджет между документами
+    (маленькие остаются целиком, большие делят остаток поровну)
+    и возвращает промпт; used_tokens / original_tokens / shortened — для отчёта.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or int(os.environ.get("AI_PROMPT_BUDGET", DEFAULT_BUDGET))
+        self.parts = []   # (текст, можно ли ужимать)
+        self.used_tokens = 0
+        self.original_tokens = 0
+        self.shortened = False
+
+    @classmethod
+    def for_provider(cls, provider, max_tokens, budget=None):
+        """Бюджет не больше окна модели за вычетом ответа"""
+        builder = cls(budget)
+        context = getattr(provider, 'context_tokens', None)
+        if context:
+            builder.budget = min(builder.budget, context - max_tokens)
+        return builder
+
+    def add(self, text):
+        self.parts.append((text, False))
+        return self
+
+    def add_document(self, text):
+        self.parts.append((text, True))
+        return self
+
+    def _allocate(self, sizes, budget):
+        """Бюджет каждого документа: по возрастанию размера, поровну из остатка"""
+        allocation = [0] * len(sizes)
+        left = len(sizes)
+        for i in sorted(range(len(sizes)), key=lambda i: sizes[i]):
+            share = budget // left
+            allocation[i] = min(sizes[i], share)
+            budget -= allocation[i]
+            left -= 1
+        return allocation
+
+    def build(self):
+        fixed = sum(estimate_tokens(text) for text, flexible in self.parts if not flexible)
+        documents = [i for i, (_, flexible) in enumerate(self.parts) if flexible]
+        sizes = [estimate_tokens(self.parts[i][0]) for i in documents]
+        allocation = dict(zip(documents, self._allocate(sizes, max(self.budget - fixed, 0))))
+
+        prompt = ""
+        self.shortened = False
+        for i, (text, flexible) in enumerate(self.parts):
+            part = fit_markdown(text, allocation[i]) if flexible else text
+            self.shortened = self.shortened or part != text
+            prompt += part
+
+        # Обе оценки — по целому тексту, чтобы они совпадали без сокращения
+        self.original_tokens = estimate_tokens(''.join(text for text, _ in self.parts))
+        self.used_tokens = estimate_tokens(prompt)
+        return prompt
+
+    def report(self):
+        """Строка для лога: сколько токенов ушло и было ли сокращение"""
+        line = f"📏 Промпт: ~{self.used_tokens} токенов из {self.budget}"
+        if self.shortened:
+            line += f" (сокращён с ~{self.original_tokens})"
+        return line
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Инвертированный полнотекстовый индекс по заметкам
+Токены нормализуются (нижний регистр, ё→е, отсечение русских окончаний),
+для каждого термина хранятся позиции вхождений в заметке.
+Индекс сохраняется между запусками и перестраивается только для изменённых заметок.
+"""
+
+import bisect
+import os
+import pickle
+import re
+
+# Версия формата и нормализации: при изменении индекс перестраивается
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Окончания русских слов, от длинных к коротким
+RU_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'иях', 'иям', 'ием', 'ией',
+    'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ешь', 'ишь', 'ете', 'ите',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем',
+    'ах', 'ях', 'ам', 'ям', 'ов', 'ев', 'ию', 'ью', 'ия', 'ья', 'ть', 'ти',
+    'ет', 'ит', 'ут', 'ют', 'ат', 'ят', 'ла', 'ли', 'ло',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+MIN_STEM = 3
+
+
+def normalize(word):
+    """Нормализовать слово: нижний регистр, ё→е, отсечь русское окончание"""
+    word = word.lower().replace('ё', 'е')
+    if not re.search('[а-я]', word):
+        return word
+
+    for ending in RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    """Нормализованные токены текста с позициями: (термин, начало, конец)"""
+    for match in TOKEN_RE.finditer(text):
+        yield normalize(match.group()), match.start(), match.end()
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс: термин → {путь заметки: [(начало, конец), ...]}.
+
+    Поиск по префиксу нормализованного термина, поэтому «кофе» находит
+    и «кофейня», как прежний поиск подстроки.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.docs = {}       # путь → {'hash': ..., 'terms': {термин: [(начало, конец)]}}
+        self.postings = {}   # термин → {путь: [(начало, конец)]}
+        self.vocabulary = []
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == INDEX_VERSION:
+                    self.docs = data['docs']
+            except Exception:
+                self.docs = {}
+
+    def update(self, notes):
+        """
+        Синхронизировать индекс со списком заметок (dict с path, hash, content).
+        Перестраиваются только заметки с изменившимся хэшем.
+        Возвращает число переиндексированных заметок.
+        """
+        current = {note['path']: note for note in notes}
+        reindexed = 0
+
+        for path in list(self.docs):
+            if path not in current:
+                del self.docs[path]
+
+        for path, note in current.items():
+            doc = self.docs.get(path)
+            if doc and doc['hash'] == note['hash']:
+                continue
+
+            terms = {}
+            for term, start, end in tokenize(note['content']):
+                terms.setdefault(term, []).append((start, end))
+            self.docs[path] = {'hash': note['hash'], 'terms': terms}
+            reindexed += 1
+
+        self._build_postings()
+        if reindexed and self.path:
+            self.save()
+        return reindexed
+
+    def _build_postings(self):
+        postings = {}
+        for path, doc in self.docs.items():
+            for term, positions in doc['terms'].items():
+                postings.setdefault(term, {})[path] = positions
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'docs': self.docs}, f)
+        os.replace(tmp_path, self.path)
+
+    def _terms_with_prefix(self, prefix):
+        i = bisect.bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            yield self.vocabulary[i]
+            i += 1
+
+    def find(self, keyword):
+        """
+        Заметки, содержащие keyword: {путь: (начало, конец) первого вхождения}.
+        Для фразы из нескольких слов нужны все слова, позиция — первого слова.
+        """
+        words = [term for term, _, _ in tokenize(keyword)]
+        if not words:
+            return {}
+
+        result = None
+        for i, word in enumerate(words):
+            hits = {}
+            for term in self._terms_with_prefix(word):
+                for path, positions in self.postings[term].items():
+                    first = positions[0]
+                    if path not in hits or first < hits[path]:
+                        hits[path] = first
+
+            if result is None:
+                result = hits
+            else:
+                result = {path: pos for path, pos in result.items() if path in hits}
+            if not result:
+                break
+
+        return result
+
+
+def context_at(content, start, end, context_size=200):
+    """Фрагмент content вокруг позиции [start, end), в одну строку"""
+    context = content[max(0, start - context_size):min(len(content), end + context_size)]
+    return context.replace('\n', ' ').strip()[:300]
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Локальный поиск похожих заметок без AI
+Заметка — вектор TF-IDF по хэшированным словам и парам слов (n-граммам).
+Векторы лежат в файле, отображённом в память (mmap), и пересчитываются
+только для изменённых заметок. С NumPy косинусная близость считается
+умножением матриц, без него — на чистом Python.
+"""
+
+import math
+import mmap
+import os
+import pickle
+import sys
+import zlib
+from array import array
+from itertools import chain
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import note_frontmatter
+from search_index import tokenize
+
+# Версия формата и признаков: при изменении векторы пересчитываются
+INDEX_VERSION = 1
+
+# Размерность хэшированного пространства признаков
+DIM = 2048
+ROW_BYTES = DIM * 4
+
+MIN_TOKEN_LEN = 2
+
+
+def features(content):
+    """Признаки заметки: {номер корзины: 1 + log(частота)} по словам и парам слов"""
+    body = note_frontmatter.parse(content).body
+    terms = [term for term, _, _ in tokenize(body) if len(term) >= MIN_TOKEN_LEN]
+    bigrams = (f"{a} {b}" for a, b in zip(terms, terms[1:]))
+
+    counts = {}
+    for gram in chain(terms, bigrams):
+        bucket = zlib.crc32(gram.encode('utf-8')) % DIM
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return {bucket: 1 + math.log(count) for bucket, count in counts.items()}
+
+
+class SimilarityIndex:
+    """
+    Векторы заметок для поиска похожих.
+
+    path — файл метаданных (pickle: путь → строка и хэш), сами векторы
+    лежат рядом в path.f32 строками по DIM чисел float32.
+    update() синхронизирует индекс со списком заметок, related() и
+    similarities() считают косинусную близость по TF-IDF.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.vectors_path = self.path.with_name(self.path.name + '.f32')
+        self.rows = {}    # путь → (номер строки, хэш содержимого)
+        self.free = []    # освободившиеся строки
+        self._file = None
+        self._mm = None
+        self._capacity = 0
+        self._idf = None
+        self._normalized = {}   # путь → вектор (без NumPy), до следующего update()
+        self._normalized_matrix = None   # все строки, нормированные (NumPy), до update()
+
+        if self.path.exists() and self.vectors_path.exists():
+            try:
+                with open(self.path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == INDEX_VERSION and data.get('dim') == DIM:
+                    self.rows = data['rows']
+                    self.free = data['free']
+            except Exception:
+                self.rows, self.free = {}, []
+
+        if self.rows:
+            self._open(max(row for row, _ in self.rows.values()) + 1)
+
+    def _open(self, capacity):
+        """Отобразить файл векторов в память, расширив его до capacity строк"""
+        if capacity <= self._capacity and self._mm is not None:
+            return
+        capacity = max(capacity, self._capacity * 2, 64)
+
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        mode = 'r+b' if self.vectors_path.exists() else 'w+b'
+        self._file = open(self.vectors_path, mode)
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() < capacity * ROW_BYTES:
+            self._file.truncate(capacity * ROW_BYTES)
+        self._mm = mmap.mmap(self._file.fileno(), capacity * ROW_BYTES)
+        self._capacity = capacity
+
+    def _write_row(self, row, vector):
+        dense = array('f', bytes(ROW_BYTES))
+        for bucket, value in vector.items():
+            dense[bucket] = value
+        self._mm[row * ROW_BYTES:(row + 1) * ROW_BYTES] = dense.tobytes()
+
+    def _read_row(self, row):
+        """Строка как разреженный вектор {корзина: значение}"""
+        dense = array('f')
+        dense.frombytes(self._mm[row * ROW_BYTES:(row + 1) * ROW_BYTES])
+        return {bucket: value for bucket, value in enumerate(dense) if value}
+
+    def update(self, notes):
+        """
+        Синхронизировать индекс со списком заметок (dict с path, hash, content).
+        Векторы считаются только для новых и изменённых заметок.
+        Возвращает число пересчитанных заметок.
+        """
+        current = {note['path']: note for note in notes}
+        changed = len(self.rows)
+
+        for path in list(self.rows):
+            if path not in current:
+                self.free.append(self.rows.pop(path)[0])
+
+        reindexed = 0
+        for path, note in current.items():
+            known = self.rows.get(path)
+            if known and known[1] == note['hash']:
+                continue
+
+            if known:
+                row = known[0]
+            else:
+                row = self.free.pop() if self.free else len(self.rows) + len(self.free)
+            self._open(row + 1)
+            self._write_row(row, features(note['content']))
+            self.rows[path] = (row, note['hash'])
+            reindexed += 1
+
+        if reindexed or changed != len(self.rows):
+            self._idf = None
+            self._normalized = {}
+            self._normalized_matrix = None
+            self.save()
+        return reindexed
+
+    def save(self):
+        if self._mm is not None:
+            self._mm.flush()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'dim': DIM,
+                         'rows': self.rows, 'free': self.free}, f)
+        os.replace(tmp_path, self.path)
+
+    def _matrix(self):
+        """Все строки файла как массив NumPy (без копирования)"""
+        return np.frombuffer(self._mm, dtype=np.float32).reshape(self._capacity, DIM)
+
+    def _weights(self):
+        """IDF по всем заметкам индекса"""
+        if self._idf is not None:
+            return self._idf
+
+        live = sorted(row for row, _ in self.rows.values())
+        total = len(live)
+        if np is not None:
+            df = (self._matrix()[live] > 0).sum(axis=0)
+            self._idf = np.log((1 + total) / (1 + df)).astype(np.float32) + 1
+        else:
+            df = [0] * DIM
+            for row in live:
+                for bucket in self._read_row(row):
+                    df[bucket] += 1
+            self._idf = [math.log((1 + total) / (1 + count)) + 1 for count in df]
+        return self._idf
+
+    def _vectors(self, paths):
+        """Нормированные TF-IDF векторы заметок paths (только проиндексированных)"""
+        paths = [path for path in paths if path in self.rows]
+        if not paths:
+            return paths, None
+
+        rows = [self.rows[path][0] for path in paths]
+        if np is not None:
+            return paths, self._normalized_rows()[rows]
+
+        idf = self._weights()
+
+        vectors = []
+        for path, row in zip(paths, rows):
+            if path not in self._normalized:
+                vector = {bucket: value * idf[bucket] for bucket, value in self._read_row(row).items()}
+                norm = math.sqrt(sum(value * value for value in vector.values())) or 1
+                self._normalized[path] = {bucket: value / norm for bucket, value in vector.items()}
+            vectors.append(self._normalized[path])
+        return paths, vectors
+
+    def _normalized_rows(self):
+        """Нормированные TF-IDF векторы всех строк файла (NumPy), один раз до update()"""
+        if self._normalized_matrix is None:
+            vectors = self._matrix() * self._weights()
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._normalized_matrix = vectors / np.where(norms > 0, norms, 1)
+        return self._normalized_matrix
+
+    @staticmethod
+    def _cosine(a, b):
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(value * b.get(bucket, 0) for bucket, value in a.items())
+
+    def similarities(self, paths):
+        """
+        Попарная близость заметок: (пути, матрица n×n списками).
+        Непроиндексированные пути в ответ не попадают.
+        """
+        paths, vectors = self._vectors(paths)
+        if not paths:
+            return [], []
+        if np is not None:
+            return paths, (vectors @ vectors.T).tolist()
+        return paths, [[self._cosine(a, b) for b in vectors] for a in vectors]
+
+    def related(self, path, k=5, candidates=None, min_score=0.0):
+        """
+        k самых похожих на path заметок среди candidates (по умолчанию — всех):
+        [(путь, близость)] по убыванию близости.
+        """
+        if path not in self.rows:
+            return []
+        candidates = [p for p in (candidates if candidates is not None else self.rows)
+                      if p != path and p in self.rows]
+        if not candidates:
+            return []
+
+        if np is not None:
+            # Близость ко всем строкам сразу — без копирования векторов кандидатов
+            matrix = self._normalized_rows()
+            all_scores = matrix @ matrix[self.rows[path][0]]
+            scores = all_scores[[self.rows[p][0] for p in candidates]].tolist()
+        else:
+            _, vectors = self._vectors([path] + candidates)
+            scores = [self._cosine(vectors[0], vector) for vector in vectors[1:]]
+
+        ranked = sorted(zip(candidates, scores), key=lambda item: -item[1])
+        return [(p, score) for p, score in ranked[:k] if score > min_score]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
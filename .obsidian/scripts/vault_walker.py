@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Обход vault и роли папок
+Одна карта «роль → папки» (входящие, черновики, приоритетные проекты,
+сессии) вместо списков папок в каждом скрипте и один обход os.scandir:
+заметки отдаются лениво, stat берётся из DirEntry и не повторяется.
+"""
+
+import json
+import os
+from pathlib import Path
+
+# Путь к vault
+VAULT_PATH = Path(__file__).parent.parent.parent
+
+# Роли папок: первая папка — основная, остальные — старые названия для совместимости
+DEFAULT_ROLES = {
+    "inbox": ["1. Исчезающие заметки", "2. Исчезающие", "Изчезающие заметки"],
+    # Старые папки «Входящие» (до исчезающих заметок) — только для отчётов
+    "incoming": ["1. Входящие", "0.Входящие"],
+    "drafts": ["2. Черновики", "3. Черновики", "0.Черновики"],
+    "projects": ["3. Приоритетные проекты", "4. Проекты",
+                 "Черновики по приоритетным проектам"],
+    "sessions": ["Сессия стратегирования"],
+}
+
+# Если есть — роли берутся отсюда поверх DEFAULT_ROLES: {"роль": ["папка", ...]}
+ROLES_CONFIG = ".obsidian/vault_folders.json"
+
+
+def load_roles(root=VAULT_PATH):
+    """Карта ролей vault: DEFAULT_ROLES, дополненная ROLES_CONFIG"""
+    roles = {role: list(folders) for role, folders in DEFAULT_ROLES.items()}
+    config_path = Path(root) / ROLES_CONFIG
+    if not config_path.exists():
+        return roles
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except ValueError as e:
+        raise ValueError(f"Некорректный {ROLES_CONFIG}: {e}")
+    if not isinstance(config, dict):
+        raise ValueError(f"{ROLES_CONFIG}: ожидается объект {{\"роль\": [\"папка\", ...]}}")
+
+    for role, folders in config.items():
+        if isinstance(folders, str):
+            folders = [folders]
+        if not isinstance(folders, list):
+            raise ValueError(f"{ROLES_CONFIG}: папки роли {role} должны быть списком")
+        roles[role] = folders
+    return roles
+
+
+def role_folders(roles, root=VAULT_PATH, existing=True):
+    """
+    Папки ролей roles (имя роли или список) в порядке карты.
+    existing=True — только те, что есть в vault.
+    """
+    if isinstance(roles, str):
+        roles = [roles]
+    role_map = load_roles(root)
+    folders = []
+    for role in roles:
+        for folder in role_map.get(role, []):
+            if folder in folders:
+                continue
+            if not existing or (Path(root) / folder).is_dir():
+                folders.append(folder)
+    return folders
+
+
+def role_dir(role, root=VAULT_PATH):
+    """Каталог роли: первая существующая папка, иначе основная (её можно создать)"""
+    folders = role_folders(role, root) or role_folders(role, root, existing=False)
+    if not folders:
+        raise ValueError(f"Неизвестная роль папки: {role}")
+    return Path(root) / folders[0]
+
+
+def role_of(rel_path, role_map):
+    """Роль папки, в которой лежит rel_path (путь относительно vault), или None"""
+    rel_path = str(rel_path)
+    for role, folders in role_map.items():
+        for folder in folders:
+            if rel_path == folder or rel_path.startswith(folder + os.sep):
+                return role
+    return None
+
+
+class NoteEntry:
+    """
+    Заметка, найденная обходом: пути сразу, stat — при первом обращении
+    (из DirEntry, без повторного системного вызова).
+    """
+
+    __slots__ = ('_entry', 'rel_path')
+
+    def __init__(self, entry, rel_path):
+        self._entry = entry
+        self.rel_path = rel_path
+
+    @property
+    def path(self):
+        return self._entry.path
+
+    @property
+    def name(self):
+        return self._entry.name[:-3]
+
+    def stat(self):
+        return self._entry.stat()
+
+    @property
+    def mtime(self):
+        return self.stat().st_mtime
+
+    @property
+    def size(self):
+        return self.stat().st_size
+
+    def __repr__(self):
+        return f"NoteEntry({self.rel_path!r})"
+
+
+def walk(root=VAULT_PATH, folders=None):
+    """
+    Лениво обойти .md заметки в папках folders (пути относительно root,
+    по умолчанию — весь vault). Служебные файлы и папки с точкой пропускаются,
+    вложенные друг в друга папки обходятся один раз.
+    """
+    root = os.fspath(root)
+    folders = [str(folder).strip('/') for folder in (folders if folders is not None else [""])]
+    # Папка внутри другой обходимой папки и так будет пройдена
+    starts = [folder for folder in dict.fromkeys(folders)
+              if not any(other != folder and (not other or folder.startswith(other + os.sep))
+                         for other in folders)]
+
+    for folder in starts:
+        stack = [os.path.join(root, folder) if folder else root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.md') and entry.is_file():
+                        yield NoteEntry(entry, os.path.relpath(entry.path, root))
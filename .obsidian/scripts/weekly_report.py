@@ -7,74 +7,158 @@ import os
 import sys
 import re
 from datetime import datetime, timedelta
-from pathlib import Path
-from openai import OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ai_provider import CACHE_DIR, ResponseCache, estimate_tokens, get_provider
+from note_index import NoteIndex
+from phrase_matcher import PhraseMatcher
+from prompt_builder import split_sections
+from similarity import SimilarityIndex
+import vault_walker
+
+# Map-reduce анализ для больших недель
+SINGLE_PROMPT_TOKENS = 6000   # до этого размера промпта — один запрос, как раньше
+CHUNK_TOKENS = 3000           # бюджет заметок на один map-запрос
+NOTE_MAX_CHARS = 3000         # сколько текста заметки уходит в map
+SUMMARY_TOKENS = 300          # ответ на одну заметку в map
+MAX_OUTPUT_TOKENS = 4000      # потолок ответа map-запроса (лимиты вывода моделей ниже 16k)
+MAP_CONCURRENCY = 4
+SUMMARY_CACHE = CACHE_DIR / "weekly_summaries.sqlite"
+SUMMARY_VERSION = 1           # при изменении map-промпта кэш резюме сбрасывается
+
+SIMILAR_NOTES = 3
+SIMILAR_MIN_SCORE = 0.1
+SIMILARITY_INDEX = CACHE_DIR / "weekly_similarity.pickle"
+
+# Роли папок для поиска заметок (папки ролей — в vault_walker) и их статусы
+SEARCH_ROLES = ["incoming", "inbox", "drafts", "projects"]
+ROLE_STATUS = {
+    "incoming": "📥 Входящая",
+    "inbox": "⏱️ Исчезающая",
+    "drafts": "📝 Черновик",
+    "projects": "⭐ Приоритетный проект",
+}
+
+SYSTEM_PROMPT = "Ты эксперт по управлению знаниями, продуктивности и работе с заметками в Obsidian."
 
 def get_weekly_notes(vault_path, days=7):
     """Получить все заметки за последние N дней"""
 
     cutoff_date = datetime.now() - timedelta(days=days)
     notes = []
-
-    # Папки для поиска заметок
-    search_folders = [
-        "1. Входящие",
-        "2. Исчезающие",
-        "3. Черновики",
-        "4. Проекты",
-        # Старые папки для совместимости
-        "0.Черновики",
-        "0.Входящие",
-        "Изчезающие заметки",
-        "Черновики по приоритетным проектам"
-    ]
-
-    for folder in search_folders:
-        folder_path = os.path.join(vault_path, folder)
-        if not os.path.exists(folder_path):
-            continue
-
-        for file in Path(folder_path).rglob("*.md"):
-            mtime = datetime.fromtimestamp(file.stat().st_mtime)
-            ctime = datetime.fromtimestamp(file.stat().st_ctime)
-
-            if mtime >= cutoff_date:
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    # Определяем статус заметки
-                    status = "📝 Черновик"
-                    if "1. Входящие" in str(file) or "0.Входящие" in str(file):
-                        status = "📥 Входящая"
-                    elif "2. Исчезающие" in str(file) or "Изчезающие заметки" in str(file):
-                        status = "⏱️ Исчезающая"
-                    elif "4. Проекты" in str(file) or "Черновики по приоритетным проектам" in str(file):
-                        status = "⭐ Приоритетный проект"
-
-                    # Извлекаем существующие ссылки
-                    links = re.findall(r'\[\[(.*?)\]\]', content)
-
-                    notes.append({
-                        'path': str(file.relative_to(vault_path)),
-                        'name': file.stem,  # Имя без .md
-                        'full_name': file.name,
-                        'date': mtime.strftime('%Y-%m-%d %H:%M'),
-                        'created': ctime.strftime('%Y-%m-%d'),
-                        'content': content,
-                        'size': len(content),
-                        'status': status,
-                        'folder': str(file.parent.relative_to(vault_path)),
-                        'links': links
-                    })
-                except Exception as e:
-                    print(f"⚠️  Не удалось прочитать {file}: {e}")
+    role_map = vault_walker.load_roles(vault_path)
+    search_folders = vault_walker.role_folders(SEARCH_ROLES, vault_path)
+
+    # Заметки берём из индекса: перечитываются только изменённые файлы
+    with NoteIndex(vault_path) as index:
+        index.refresh(search_folders)
+
+        for folder in search_folders:
+            for note in index.notes(folder, modified_since=cutoff_date.timestamp()):
+                mtime = datetime.fromtimestamp(note['mtime'])
+                ctime = datetime.fromtimestamp(note['ctime'])
+                path = note['path']
+
+                # Статус заметки — по роли её папки
+                status = ROLE_STATUS.get(vault_walker.role_of(path, role_map), "📝 Черновик")
+
+                notes.append({
+                    'path': path,
+                    'hash': note['hash'],
+                    'name': note['name'],  # Имя без .md
+                    'full_name': os.path.basename(path),
+                    'date': mtime.strftime('%Y-%m-%d %H:%M'),
+                    'created': ctime.strftime('%Y-%m-%d'),
+                    'content': note['content'],
+                    'size': len(note['content']),
+                    'status': status,
+                    'folder': os.path.dirname(path),
+                    'links': note['links']
+                })
 
     notes.sort(key=lambda x: x['date'], reverse=True)
     return notes
 
-def analyze_notes_with_links(notes, api_key):
-    """Анализ заметок с созданием связей"""
+def find_similar_notes(vault_path, notes):
+    """
+    Похожие заметки по содержимому, без AI: для каждой заметки недели —
+    ближайшие по TF-IDF среди всех заметок папок поиска.
+    """
+    search_folders = vault_walker.role_folders(SEARCH_ROLES, vault_path)
+    with NoteIndex(vault_path) as index:
+        index.refresh(search_folders)
+        corpus = {}
+        for folder in search_folders:
+            for note in index.notes(folder):
+                corpus[note['path']] = note
+
+    names = {path: note['name'] for path, note in corpus.items()}
+    with SimilarityIndex(SIMILARITY_INDEX) as similarity:
+        similarity.update(corpus.values())
+        return {
+            note['name']: [
+                names[path]
+                for path, _ in similarity.related(note['path'], SIMILAR_NOTES,
+                                                  min_score=SIMILAR_MIN_SCORE)
+            ]
+            for note in notes
+        }
+
+def find_suggested_links(notes, text):
+    """
+    Предложенные связи по тексту анализа.
+
+    Имена заметок ищутся за один проход, целыми словами. Заметки связываются,
+    если упомянуты в одной секции; вес пары — число общих секций
+    (вдвое больше, если одна из заметок стоит в заголовке секции).
+    Для каждой заметки — список других, по убыванию веса, без уже
+    существующих связей.
+    """
+    names = [note['name'] for note in notes]
+    matcher = PhraseMatcher(names)
+    # Секции как (начало, конец, конец заголовка) в тексте
+    sections = []
+    offset = 0
+    for heading, body in split_sections(text):
+        heading_end = offset + len(heading)
+        end = min(heading_end + (1 if heading else 0) + len(body), len(text))
+        sections.append((offset, end, heading_end))
+        offset = end
+
+    # Секция → {номер заметки: упомянута ли в заголовке секции}
+    by_section = {}
+    section = 0
+    for start, _, note_id in matcher.finditer(text):
+        while start >= sections[section][1]:
+            section += 1
+        in_heading = start < sections[section][2]
+        mentioned = by_section.setdefault(section, {})
+        mentioned[note_id] = mentioned.get(note_id, False) or in_heading
+
+    weights = {}
+    for mentioned in by_section.values():
+        for a, a_heading in mentioned.items():
+            for b, b_heading in mentioned.items():
+                if a != b:
+                    pair_weights = weights.setdefault(a, {})
+                    pair_weights[b] = pair_weights.get(b, 0) + (2 if a_heading or b_heading else 1)
+
+    suggested_links = {}
+    for i, note in enumerate(notes):
+        existing = {link.split('|')[0].split('#')[0] for link in note['links']}
+        ranked = sorted(weights.get(i, {}).items(), key=lambda item: (-item[1], item[0]))
+        suggested_links[note['name']] = list(dict.fromkeys(
+            names[j] for j, _ in ranked if names[j] != note['name'] and names[j] not in existing
+        ))
+    return suggested_links
+
+def analyze_notes_with_links(notes, provider, map_reduce=None):
+    """
+    Анализ заметок с созданием связей.
+
+    map_reduce: None — выбрать автоматически по размеру промпта,
+    True/False — принудительно включить/выключить map-reduce.
+    """
 
     if not notes:
         return "Заметок для анализа не найдено.", {}
@@ -87,8 +171,6 @@ def analyze_notes_with_links(notes, api_key):
         notes_list += f"   Папка: {note['folder']}\n"
         notes_list += f"   Содержание: {preview}...\n"
 
-    client = OpenAI(api_key=api_key)
-
     prompt = f"""Ты эксперт по управлению знаниями и работе с заметками.
 
 Проанализируй эти {len(notes)} заметок за неделю:
@@ -118,37 +200,193 @@ def analyze_notes_with_links(notes, api_key):
 ВАЖНО: Для каждой заметки пиши конкретные рекомендации, а не общие слова!
 """
 
+    if map_reduce is None:
+        map_reduce = estimate_tokens(prompt) > SINGLE_PROMPT_TOKENS
+    if map_reduce:
+        return analyze_notes_map_reduce(notes, provider)
+
     try:
         print("🤖 Анализирую заметки и создаю связи...")
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Ты эксперт по управлению знаниями, продуктивности и работе с заметками в Obsidian."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
-
-        analysis = response.choices[0].message.content.strip()
+        analysis = provider.chat(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=prompt,
+            max_tokens=4000,
+            temperature=0.7
+        ).strip()
 
         # Извлекаем предложенные связи
-        suggested_links = {}
+        suggested_links = find_suggested_links(notes, analysis)
+
+        return analysis, suggested_links
+
+    except Exception as e:
+        return f"❌ Ошибка при анализе: {e}", {}
+
+def note_block(number, note):
+    """Заметка для map-промпта: номер, имя, папка и начало текста"""
+    content = note['content'][:NOTE_MAX_CHARS]
+    return (f"### {number}. {note['name']} ({note['status']})\n"
+            f"Папка: {note['folder']}\n\n{content}\n")
+
+def pack_chunks(notes, budget=CHUNK_TOKENS, max_notes=MAX_OUTPUT_TOKENS // SUMMARY_TOKENS):
+    """
+    Разложить заметки по чанкам: вход каждого укладывается в budget токенов,
+    а ответ (SUMMARY_TOKENS на заметку) — в MAX_OUTPUT_TOKENS
+    """
+    chunks, chunk, used = [], [], 0
+    for note in notes:
+        tokens = estimate_tokens(note_block(0, note))
+        if chunk and (used + tokens > budget or len(chunk) >= max_notes):
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(note)
+        used += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def map_prompt(chunk):
+    blocks = "\n".join(note_block(i, note) for i, note in enumerate(chunk, 1))
+    return f"""Проанализируй каждую из {len(chunk)} заметок:
+
+{blocks}
+
+Для КАЖДОЙ заметки начни блок строкой "### <номер>" (номер как выше) и дай:
+- **Резюме:** 1-2 предложения
+- **Темы:** ключевые темы через запятую
+- **Статус:** завершена / требует доработки / в процессе
+- **Рекомендации:** что конкретно доработать
+- **Следующие шаги:** 1-3 пункта
+
+Пиши на русском, конкретно, без вступлений и общих слов.
+"""
+
+def split_summaries(response, count):
+    """Разрезать ответ map-запроса на резюме по номерам заметок"""
+    summaries = {}
+    parts = re.split(r'^###\s*(\d+)\.?[^\n]*\n', response, flags=re.MULTILINE)
+    for number, text in zip(parts[1::2], parts[2::2]):
+        number = int(number)
+        if 1 <= number <= count and text.strip():
+            summaries[number - 1] = text.strip()
+    return summaries
+
+def summary_key(provider, note):
+    return ResponseCache.make_key(
+        provider.name, provider.model, f"weekly-map-{SUMMARY_VERSION}",
+        note['hash'], NOTE_MAX_CHARS, SUMMARY_TOKENS
+    )
+
+def summarize_notes(notes, provider):
+    """
+    Map: резюме каждой заметки. Резюме кэшируются по хэшу содержимого,
+    в модель уходят только новые и изменённые заметки — чанками, параллельно.
+    """
+    cache = ResponseCache(SUMMARY_CACHE)
+    try:
+        summaries = {}
+        pending = []
+        for note in notes:
+            cached = cache.get(summary_key(provider, note))
+            if cached is not None:
+                summaries[note['path']] = cached
+            else:
+                pending.append(note)
+
+        chunks = pack_chunks(pending)
+        print(f"🗂️  Резюме из кэша: {len(summaries)}, к анализу: {len(pending)} "
+              f"заметок в {len(chunks)} чанках")
+
+        results = provider.batch_chat([
+            {
+                'system_prompt': SYSTEM_PROMPT,
+                'user_prompt': map_prompt(chunk),
+                'max_tokens': SUMMARY_TOKENS * len(chunk),
+                'temperature': 0.3,
+            }
+            for chunk in chunks
+        ], concurrency=MAP_CONCURRENCY)
+
+        for chunk, result in zip(chunks, results):
+            if result['error']:
+                print(f"⚠️  Ошибка анализа чанка ({len(chunk)} заметок): {result['error']}")
+                continue
+            for i, text in split_summaries(result['response'], len(chunk)).items():
+                summaries[chunk[i]['path']] = text
+                cache.put(summary_key(provider, chunk[i]), text)
+
+        return summaries
+    finally:
+        cache.close()
+
+def summary_line(summary, field):
+    """Значение поля вида '**Резюме:** ...' из резюме заметки"""
+    match = re.search(rf'{field}:\**\s*(.+)', summary)
+    return match.group(1).strip() if match else ""
+
+def analyze_notes_map_reduce(notes, provider):
+    """
+    Анализ большой недели: map — резюме заметок по чанкам (параллельно,
+    с кэшем), reduce — один запрос о связях и итогах недели по резюме.
+    """
+    try:
+        print(f"🤖 Анализирую {len(notes)} заметок по частям (map-reduce)...")
+        summaries = summarize_notes(notes, provider)
+        if not summaries:
+            return "❌ Ошибка при анализе: ни одна заметка не проанализирована", {}
+
+        digest = ""
+        for i, note in enumerate(notes, 1):
+            summary = summaries.get(note['path'])
+            if summary is None:
+                continue
+            digest += f"\n{i}. **{note['name']}** ({note['status']})\n"
+            digest += f"   Резюме: {summary_line(summary, 'Резюме')}\n"
+            digest += f"   Темы: {summary_line(summary, 'Темы')}\n"
+
+        reduce_prompt = f"""Вот краткие резюме {len(summaries)} заметок за неделю:
+
+{digest}
+
+**Твоя задача:**
+
+1. **Связи между заметками:**
+   - Какие заметки связаны между собой?
+   - Какие темы пересекаются?
+   - Предложи конкретные связи (укажи названия заметок)
+
+2. **Общий анализ:**
+   - Основные темы недели
+   - Прогресс по проектам
+   - Приоритеты на следующую неделю
+
+Формат ответа: структурированный Markdown на русском языке.
+"""
+
+        print("🔗 Свожу резюме в общий анализ...")
+        overview = provider.chat(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=reduce_prompt,
+            max_tokens=4000,
+            temperature=0.7
+        ).strip()
+
+        analysis = "## Разбор заметок\n"
         for note in notes:
-            suggested_links[note['name']] = []
-            # Ищем упоминания других заметок в анализе
-            for other_note in notes:
-                if other_note['name'] != note['name']:
-                    if other_note['name'].lower() in analysis.lower():
-                        suggested_links[note['name']].append(other_note['name'])
+            summary = summaries.get(note['path'], "⚠️ Заметку не удалось проанализировать.")
+            analysis += f"\n### {note['name']}\n\n{summary}\n"
+        analysis += f"\n{overview}"
+
+        # Связи ищем только в сводной части: в разборе упомянуты все заметки
+        suggested_links = find_suggested_links(notes, overview)
 
         return analysis, suggested_links
 
     except Exception as e:
         return f"❌ Ошибка при анализе: {e}", {}
 
-def create_report(notes, analysis, suggested_links, vault_path):
+def create_report(notes, analysis, suggested_links, vault_path, similar_notes=None):
     """Создать отчёт с кликабельными ссылками"""
 
     today = datetime.now()
@@ -201,6 +439,12 @@ def create_report(notes, analysis, suggested_links, vault_path):
                 report += ", ".join([f"[[{link}]]" for link in suggested_links[note['name']][:3]])
                 report += "\n\n"
 
+            # Похожие по содержимому
+            if similar_notes and similar_notes.get(note['name']):
+                report += f"**🔎 Похожие заметки:** "
+                report += ", ".join([f"[[{name}]]" for name in similar_notes[note['name']]])
+                report += "\n\n"
+
             report += "---\n\n"
 
     # AI Анализ
@@ -242,19 +486,11 @@ def create_report(notes, analysis, suggested_links, vault_path):
 def main():
     vault_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    # Получаем API ключ
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        env_file = os.path.join(vault_path, '.env')
-        if os.path.exists(env_file):
-            with open(env_file, 'r') as f:
-                for line in f:
-                    if line.startswith('OPENAI_API_KEY='):
-                        api_key = line.split('=', 1)[1].strip()
-                        break
-
-    if not api_key:
-        print("❌ OPENAI_API_KEY не найден")
+    # Получаем AI провайдера
+    try:
+        provider = get_provider("openai")
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
         sys.exit(1)
 
     print("📊 Генерирую недельный отчёт...")
@@ -268,10 +504,15 @@ def main():
         return
 
     # Анализируем и создаём связи
-    analysis, suggested_links = analyze_notes_with_links(notes, api_key)
+    with provider:
+        map_reduce = True if "--map-reduce" in sys.argv else None
+        analysis, suggested_links = analyze_notes_with_links(notes, provider, map_reduce)
+
+    # Похожие заметки считаем локально
+    similar_notes = find_similar_notes(vault_path, notes)
 
     # Создаём отчёт
-    report = create_report(notes, analysis, suggested_links, vault_path)
+    report = create_report(notes, analysis, suggested_links, vault_path, similar_notes)
 
     # Сохраняем
     today = datetime.now()